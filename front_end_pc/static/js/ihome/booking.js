@@ -79,6 +79,28 @@ $(document).ready(function(){
     })
 
 
+    // 获取房屋未来几个月的预订日历, 已被预订的晚上不能选为入住日期
+    var today = new Date();
+    var month = today.getFullYear() + "-" + ("0" + (today.getMonth() + 1)).slice(-2);
+    $.ajax({
+        url: host + "/api/v1.0/houses/" + houseId + "/calendar?month=" + month + "&months=6",
+        type: "get",
+        xhrFields: {withCredentials: true},
+        success: function (resp) {
+            if (resp.errno == "0") {
+                var disabledDates = [];
+                $.each(resp.data.months, function (i, item) {
+                    for (var day = 1; day <= item.days; day++) {
+                        if (item.booked.charAt(day - 1) == "1") {
+                            disabledDates.push(item.month + "-" + ("0" + day).slice(-2));
+                        }
+                    }
+                });
+                $("#start-date").datepicker("setDatesDisabled", disabledDates);
+            }
+        }
+    })
+
     // 订单提交
     $(".submit-btn").on("click", function () {
         var start_date = $("#start-date").val()
@@ -0,0 +1,89 @@
+"""
+房屋的预订日历
+
+按 房屋 x 月份 缓存已经被预订的晚上, 每个月用两种紧凑的格式表示:
+    booked: 每天一个字符的位串, "1" 表示当晚已被预订, 例如 "0011100..."
+    ranges: 已预订的连续日期区间 [[开始日, 结束日], ...], 两端都包含
+下单、拒单、取消订单时删除对应月份的缓存
+"""
+import datetime
+
+from django.core.cache import caches
+
+from order.models import Order
+from utils import constants
+
+
+def month_key(house_id, month):
+    """缓存的key, month 为当月1号的 date"""
+    return constants.HOUSE_CALENDAR_REDIS_KEY % (house_id, month.strftime("%Y-%m"))
+
+
+def add_months(month, count):
+    """month 之后第 count 个月的1号"""
+    year, index = divmod(month.year * 12 + month.month - 1 + count, 12)
+    return datetime.date(year, index + 1, 1)
+
+
+def house_calendar(house_id, first_month, count):
+    """
+    获取房屋连续几个月的预订日历, 缓存中没有的月份用一次查询补齐
+    :param house_id: 房屋id
+    :param first_month: 第一个月的1号
+    :param count: 月份数
+    :return: 每个月的日历组成的列表
+    """
+    house_cache = caches["house_cache"]
+    months = [add_months(first_month, i) for i in range(count)]
+    keys = [month_key(house_id, month) for month in months]
+    cached = house_cache.get_many(keys)
+
+    missing = [month for month, key in zip(months, keys) if key not in cached]
+    if missing:
+        window_begin, window_end = missing[0], add_months(missing[-1], 1)
+        # 只查询和缺失月份有重叠的有效订单, 走 (house_id, begin_date, end_date) 索引
+        orders = list(Order.objects.filter(house_id=house_id, begin_date__lt=window_end, end_date__gt=window_begin)
+                      .exclude(status__in=Order.ORDER_STATUS_INACTIVE).values_list("begin_date", "end_date"))
+        computed = {month_key(house_id, month): build_month(month, orders) for month in missing}
+        house_cache.set_many(computed, constants.HOUSE_CALENDAR_REDIS_EXPIRES)
+        cached.update(computed)
+
+    return [cached[key] for key in keys]
+
+
+def build_month(month, orders):
+    """根据订单的 (begin_date, end_date) 生成一个月的日历, end_date 当晚不算预订"""
+    next_month = add_months(month, 1)
+    days = (next_month - month).days
+    bits = ["0"] * days
+    for begin_date, end_date in orders:
+        begin = max(begin_date, month)
+        end = min(end_date, next_month)
+        for day in range((begin - month).days, (end - month).days):
+            bits[day] = "1"
+
+    booked = "".join(bits)
+    ranges = []
+    day = booked.find("1")
+    while day != -1:
+        end = booked.find("0", day)
+        end = days if end == -1 else end
+        ranges.append([day + 1, end])
+        day = booked.find("1", end)
+
+    return {"month": month.strftime("%Y-%m"), "days": days, "booked": booked, "ranges": ranges}
+
+
+def invalidate(bookings):
+    """
+    删除订单涉及的月份的日历缓存
+    :param bookings: (house_id, begin_date, end_date) 组成的列表
+    """
+    keys = set()
+    for house_id, begin_date, end_date in bookings:
+        month = datetime.date(begin_date.year, begin_date.month, 1)
+        while month < end_date:
+            keys.add(month_key(house_id, month))
+            month = add_months(month, 1)
+    if keys:
+        caches["house_cache"].delete_many(list(keys))
@@ -0,0 +1,26 @@
+"""
+首页和房屋详情的缓存
+
+首页推荐和房屋详情的数据包含房屋图片、房东的用户名和头像, 缓存在 house_cache 中
+修改这些数据时调用 invalidate, 在事务提交后删除缓存, 下次访问时重新生成
+"""
+from django.core.cache import caches
+from django.db import transaction
+
+from homes.models import House
+from utils import constants
+
+
+def invalidate(house_ids):
+    """
+    事务提交后删除首页和房屋详情的缓存, 不在事务中时立即删除
+    :param house_ids: 数据发生变化的房屋id
+    """
+    keys = [constants.HOUSE_DETAIL_REDIS_KEY % house_id for house_id in house_ids]
+    keys.append(constants.HOME_PAGE_DATA_REDIS_KEY)
+    transaction.on_commit(lambda: caches["house_cache"].delete_many(keys))
+
+
+def invalidate_user(user):
+    """用户修改用户名或头像后, 删除该用户所有房屋的缓存"""
+    invalidate(list(House.objects.filter(user=user).values_list("id", flat=True)))
@@ -0,0 +1,99 @@
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from homes.models import Area, House
+from users.models import User
+from utils import constants
+
+
+class Rollback(Exception):
+    """用于回滚基准测试造的数据"""
+
+
+# 统计的session缓存操作, 每次调用是一次redis请求
+CACHE_METHODS = ("get", "get_many", "set", "add", "delete", "has_key")
+
+# Django 自带的cache session和认证中间件
+STOCK_SETTINGS = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.cache",
+    "MIDDLEWARE": [name.replace("utils.sessions.AuthenticationMiddleware",
+                                "django.contrib.auth.middleware.AuthenticationMiddleware")
+                   for name in settings.MIDDLEWARE],
+}
+
+
+class Command(BaseCommand):
+    """
+    统计登录用户访问公开接口时每个请求的session redis请求数和SQL查询数
+    stock: Django 自带的cache session和认证中间件
+    snapshot: 带本地缓存和用户快照的session
+    session只在视图读取时才加载, 不读取用户的公开接口两种配置都没有session请求和用户查询
+    用法: python manage.py bench_public_views --requests 100
+    """
+    help = "公开接口的session和用户加载的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100, help="每个接口请求的次数")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                area = Area.objects.create(name="bench")
+                user = User.objects.create_user(username="bench_public", mobile="10000000041", password="bench")
+                house = House.objects.create(user=user, area=area, title="bench", price=100)
+                endpoints = [
+                    ("areas", "/api/v1.0/areas/"),
+                    ("index", "/api/v1.0/houses/index/"),
+                    ("search", "/api/v1.0/houses?aid=%d" % area.id),
+                    # 详情页只从session中读取用户id, 不查询用户
+                    ("detail", "/api/v1.0/houses/%d/" % house.id),
+                ]
+                self.stdout.write("%-12s %-10s %14s %10s" % ("endpoint", "config", "session ops", "sql"))
+                for name, path in endpoints:
+                    for config in ("stock", "snapshot"):
+                        ops, sql = self.measure(user, path, config, options["requests"])
+                        self.stdout.write("%-12s %-10s %14.2f %10.2f" % (name, config, ops, sql))
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            caches["house_cache"].delete_many([constants.HOME_PAGE_DATA_REDIS_KEY,
+                                               constants.HOUSE_DETAIL_REDIS_KEY % house.id])
+
+    def measure(self, user, path, config, requests):
+        """平均每个请求的session缓存操作数和SQL查询数"""
+        with override_settings(**(STOCK_SETTINGS if config == "stock" else {})):
+            client = Client()
+            client.force_login(user)
+            # 预热, 生成接口缓存和用户快照
+            client.get(path)
+            client.get(path)
+
+            session_cache = caches[settings.SESSION_CACHE_ALIAS]
+            counter = Counter()
+            patches = [mock.patch.object(session_cache, method, self.counting(getattr(session_cache, method), counter))
+                       for method in CACHE_METHODS]
+            for patch in patches:
+                patch.start()
+            try:
+                with CaptureQueriesContext(connection) as ctx:
+                    for _ in range(requests):
+                        client.get(path)
+            finally:
+                for patch in patches:
+                    patch.stop()
+        return sum(counter.values()) / requests, len(ctx.captured_queries) / requests
+
+    @staticmethod
+    def counting(func, counter):
+        def wrapper(*args, **kwargs):
+            counter[func.__name__] += 1
+            return func(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 14:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def init_house_counts(apps, schema_editor):
+    """根据已完成的订单初始化房屋的订单数和评论数"""
+    House = apps.get_model("homes", "House")
+    Order = apps.get_model("order", "Order")
+    complete = 4
+    counts = Order.objects.filter(status=complete).values("house_id").annotate(
+        order_count=Count("id"), comment_count=Count("comment"))
+    for row in counts:
+        House.objects.filter(id=row["house_id"]).update(order_count=row["order_count"],
+                                                        comment_count=row["comment_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homes', '0005_houseimage'),
+        ('order', '0002_auto_20191018_2209'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(init_house_counts, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 from django.db.models import Q
 
-from order.models import Order
+from order.models import Order, order_history
 from utils.model import BaseModel
 from django.db import models
 from django.conf import settings
@@ -48,11 +48,22 @@ class House(BaseModel):
     min_days = models.IntegerField(default=1)  # 最少入住天数
     max_days = models.IntegerField(default=0)  # 最多入住天数，0表示不限制
     order_count = models.IntegerField(default=0)  # 预订完成的该房屋的订单数
+    comment_count = models.IntegerField(default=0)  # 该房屋的评论数
     index_image_url = models.CharField(max_length=256, default="")  # 房屋主图片的路径
     facility = models.ManyToManyField("Facility", verbose_name="和设施表之间多对多关系")
 
     class Meta:
         db_table = "tb_house"
+        indexes = [
+            # 搜索: 按区域筛选后按价格、订单量、发布时间排序
+            models.Index(fields=["area", "price"], name="tb_house_area_price_idx"),
+            models.Index(fields=["area", "order_count"], name="tb_house_area_ocount_idx"),
+            models.Index(fields=["area", "create_time"], name="tb_house_area_ctime_idx"),
+            # 不选区域时的排序, 以及首页按订单量取前几个
+            models.Index(fields=["price"], name="tb_house_price_idx"),
+            models.Index(fields=["order_count"], name="tb_house_ocount_idx"),
+            models.Index(fields=["create_time"], name="tb_house_ctime_idx"),
+        ]
 
     def to_basic_dict(self):
         """将基本信息转换为字典数据"""
@@ -104,12 +115,14 @@ class House(BaseModel):
 
         # 评论信息
         comments = []
-        orders = Order.objects.filter(house=self, status=Order.ORDER_STATUS["COMPLETE"], comment__isnull=False).order_by("-update_time")[0:30]
+        # 评论包括归档的历史订单
+        orders = order_history(("comment", "user__username", "user__mobile", "update_time"), ["-update_time"],
+                               house=self, status=Order.ORDER_STATUS["COMPLETE"], comment__isnull=False)[0:30]
         for order in orders:
             comment = {
-                "comment": order.comment,  # 评论的内容
-                "user_name": order.user.username if order.user.username != order.user.mobile else "匿名用户",  # 发表评论的用户
-                "ctime": order.update_time.strftime("%Y-%m-%d %H:%M:%S")  # 评价的时间
+                "comment": order["comment"],  # 评论的内容
+                "user_name": order["user__username"] if order["user__username"] != order["user__mobile"] else "匿名用户",  # 发表评论的用户
+                "ctime": order["update_time"].strftime("%Y-%m-%d %H:%M:%S")  # 评价的时间
             }
             comments.append(comment)
         house_dict["comments"] = comments
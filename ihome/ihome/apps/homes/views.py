@@ -5,18 +5,20 @@ from django.core.paginator import Paginator
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.db import DatabaseError
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.db import transaction
 from django.conf import settings
 from django_redis import get_redis_connection
 
-from apps.homes.models import Area, House, Facility, HouseImage
+from homes import booking_calendar, house_cache
+from homes.models import Area, House, Facility, HouseImage
 from libs.qiniu.qiniu_storage import storage
-from apps.order.models import Order
+from order.models import Order
 from utils import constants
-from utils.decorators import login_required
+from utils.decorators import idempotent, login_required
 from utils.param_checking import image_file
 from utils.response_code import RET
+from utils.sessions import session_user_id
 import logging
 import json
 logger = logging.getLogger("django")
@@ -55,13 +57,17 @@ class IndexView(View):
     def get(self,request):
         # 使用切片获取 五间房屋的数据
         # 应该 对其进行排序 选择排名靠前的五家  按照该房屋的订单数进行排序
-        try:
-            hoses = houses = House.objects.order_by("-order_count")[0:5]
-        except DatabaseError as e:
-            logger.error(e)
-            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
-        # 构造返回的数据
-        data = [hose.to_basic_dict() for hose in hoses]
+        # 首页数据先从缓存中获取, 房屋、房东信息变化和订单完成时会删除这个缓存
+        data = caches["house_cache"].get(constants.HOME_PAGE_DATA_REDIS_KEY)
+        if data is None:
+            try:
+                hoses = houses = House.objects.order_by("-order_count")[0:5]
+                # 构造返回的数据
+                data = [hose.to_basic_dict() for hose in hoses]
+            except DatabaseError as e:
+                logger.error(e)
+                return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
+            caches["house_cache"].set(constants.HOME_PAGE_DATA_REDIS_KEY, data, constants.HOME_PAGE_DATA_REDIS_EXPIRES)
 
         return http.JsonResponse({
             'data': data,
@@ -73,25 +79,26 @@ class IndexView(View):
 # 房屋的详情页面
 class DetailView(View):
     def get(self,request,house_id):
-        # 获取 房间 信息
-        try:
-            house = House.objects.get(id=house_id)
-        except DatabaseError as e :
-            logger.error(e)
-            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
-        # 判断是否是登录用户
-        user = request.user
-        if user.is_authenticated:
-            # 若是登录用户
-            user_id = 1
-
-        else:
+        # 获取 房间 信息, 先从缓存中获取, 房屋、房东信息变化和订单完成时会删除这个缓存
+        redis_key = constants.HOUSE_DETAIL_REDIS_KEY % house_id
+        house_dict = caches["house_cache"].get(redis_key)
+        if house_dict is None:
+            try:
+                house = House.objects.get(id=house_id)
+                house_dict = house.to_full_dict()
+            except DatabaseError as e :
+                logger.error(e)
+                return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
+            caches["house_cache"].set(redis_key, house_dict, constants.HOUSE_DETAIL_REDIS_EXPIRE_SECOND)
+        # 判断是否是登录用户, 只读取session中的用户id, 不查询用户
+        user_id = session_user_id(request)
+        if user_id is None:
             # 若不是登录用户
             user_id = -1
 
         # 返回响应
         return http.JsonResponse({'errmsg':'ok','errno':RET.OK,
-                                      'data':{'user_id':user_id,'house':house.to_full_dict()}})
+                                      'data':{'user_id':user_id,'house':house_dict}})
 
 # 展示用户发布的房源  即 我的房屋列表的实现
 class ShowReleaseView(View):
@@ -164,6 +171,10 @@ class ReleaseHouseView(View):
         else:
             conflict_order = []
 
+        if start_date or end_date:
+            # 已取消和已拒单的订单不算冲突
+            conflict_order = conflict_order.exclude(status__in=Order.ORDER_STATUS_INACTIVE)
+
         # 取到冲突订单的房屋id
         conflict_house_id = [order.house_id for order in conflict_order]
         # 添加条件:查询出来的房屋不包括冲突订单中的房屋id
@@ -218,6 +229,7 @@ class ReleaseHouseView(View):
         return http.JsonResponse({"errno": RET.OK, "errmsg": "OK", "data": data})
     # 发布房源
     @method_decorator(login_required)
+    @method_decorator(idempotent)
     def post(self,request):
         user = request.user
         # 获取数据  前端发送的数据类型是json字符串
@@ -276,12 +288,15 @@ class ReleaseHouseView(View):
                 transaction.savepoint_rollback(save_id)
                 return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库保存失败"})
             transaction.savepoint_commit(save_id)
+            # 新发布的房屋可能出现在首页推荐中
+            house_cache.invalidate([house.id])
         return http.JsonResponse({"errno": RET.OK, "errmsg": "发布成功","data":{"house_id":house.id}})
 
 # 上传房源图片
 class ReleaseHouseImageView(View):
 
     @method_decorator(login_required)
+    @method_decorator(idempotent)
     def post(self,request,house_id):
         # 获取数据
         image = request.FILES.get('house_image')
@@ -314,7 +329,8 @@ class ReleaseHouseImageView(View):
                 # 判断 house中的 主图片是否有 没有的话,则添加
                 if not house.index_image_url:
                     house.index_image_url = key
-                    house.save()
+                    # 只保存主图片字段, 不覆盖并发累加的订单数和评论数
+                    house.save(update_fields=["index_image_url", "update_time"])
                 house_image = HouseImage(house=house,url=key)
                 house_image.save()
             except Exception as e:
@@ -323,7 +339,92 @@ class ReleaseHouseImageView(View):
                 return http.JsonResponse({"errno": RET.THIRDERR, "errmsg": "上传图片失败"})
             else:
                 transaction.savepoint_commit(save_id)
+                # 房屋图片和主图片已经变化, 删除首页和详情的缓存
+                house_cache.invalidate([house.id])
 
         data = {"url":settings.QINIU_URL+key}
         return http.JsonResponse({"errno":RET.OK,"errmsg":"图片上传成功","data":data})
 
+
+# 批量查询房屋在指定日期是否可以预订以及总价
+class HouseQuoteView(View):
+    def get(self,request):
+        args = request.GET
+        house_ids_str = args.get('hids', '')
+        start_date_str = args.get('sd', '')
+        end_date_str = args.get('ed', '')
+
+        try:
+            # 房屋id用逗号分隔, 去掉重复的id
+            house_ids = sorted({int(house_id) for house_id in house_ids_str.split(',')})
+            start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
+            end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d')
+            assert start_date < end_date, Exception('开始时间大于结束时间')
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        if len(house_ids) > constants.HOUSE_QUOTE_MAX_COUNT:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        days = (end_date - start_date).days
+
+        # 不管多少间房屋都只查询两次: 房屋的价格和天数限制, 以及有冲突订单的房屋
+        try:
+            houses = {house["id"]: house for house in House.objects.filter(id__in=house_ids)
+                      .values("id", "price", "min_days", "max_days")}
+            booked_ids = set(Order.objects.filter(house_id__in=house_ids, begin_date__lt=end_date, end_date__gt=start_date)
+                             .exclude(status__in=Order.ORDER_STATUS_INACTIVE).values_list("house_id", flat=True))
+        except DatabaseError as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
+
+        quotes = []
+        for house_id in house_ids:
+            house = houses.get(house_id)
+            if not house:
+                reason = "not_found"
+            elif house_id in booked_ids:
+                reason = "booked"
+            elif days < house["min_days"]:
+                reason = "min_days"
+            elif house["max_days"] and days > house["max_days"]:
+                reason = "max_days"
+            else:
+                reason = ""
+            quotes.append({
+                "house_id": house_id,
+                "available": not reason,
+                "reason": reason,
+                "days": days,
+                "amount": days * house["price"] if house else 0
+            })
+
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "OK", "data": {"houses": quotes}})
+
+
+# 房屋的预订日历, 返回每个月哪些晚上已经被预订
+class HouseCalendarView(View):
+    def get(self,request,house_id):
+        args = request.GET
+        month_str = args.get('month', '')
+        count = args.get('months', '1')
+
+        try:
+            if month_str:
+                month = datetime.datetime.strptime(month_str, '%Y-%m').date()
+            else:
+                month = datetime.date.today().replace(day=1)
+            count = int(count)
+            assert 0 < count <= constants.HOUSE_CALENDAR_MAX_MONTHS, Exception('月份数超出范围')
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        try:
+            months = booking_calendar.house_calendar(int(house_id), month, count)
+        except DatabaseError as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询失败"})
+
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "OK", "data": {"house_id": int(house_id), "months": months}})
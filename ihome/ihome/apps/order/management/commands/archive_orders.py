@@ -0,0 +1,83 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from order.models import Order, OrderArchive
+from utils import constants
+
+logger = logging.getLogger("django")
+
+# 已经结束, 不会再发生变化的订单状态
+FINISHED_STATUS = (Order.ORDER_STATUS["COMPLETE"], Order.ORDER_STATUS["CANCELED"], Order.ORDER_STATUS["REJECTED"])
+
+
+class Command(BaseCommand):
+    """
+    把很久以前已经结束的订单从 tb_order 移到 tb_order_archive
+    每批在一个短事务中执行 INSERT ... SELECT 和 DELETE, 中途退出后重新执行即可继续
+    用法: python manage.py archive_orders --months 6
+    """
+    help = "归档历史订单"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=constants.ORDER_ARCHIVE_MONTHS,
+                            help="结束超过多少个月的订单需要归档")
+        parser.add_argument("--batch-size", type=int, default=constants.ORDER_ARCHIVE_BATCH_SIZE,
+                            help="每批归档的订单数")
+        parser.add_argument("--pause", type=float, default=0.1, help="每批之间暂停的秒数, 给其他事务让出锁")
+
+    def handle(self, *args, **options):
+        deadline = months_ago(timezone.now(), options["months"])
+        count = archive_orders(deadline, options["batch_size"], options["pause"])
+        self.stdout.write("归档 %s 之前结束的订单 %d 个" % (deadline.strftime("%Y-%m-%d"), count))
+
+
+def months_ago(now, months):
+    """计算 months 个月之前的时间, 日期超出当月天数时取当月最后一天"""
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    day = now.day
+    while True:
+        try:
+            return now.replace(year=year, month=month, day=day)
+        except ValueError:
+            day -= 1
+
+
+def archive_orders(deadline, batch_size, pause=0):
+    """
+    分批归档 deadline 之前结束的订单
+    :return: 归档的订单总数
+    """
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(field.column) for field in Order._meta.concrete_fields)
+    hot_table = quote_name(Order._meta.db_table)
+    cold_table = quote_name(OrderArchive._meta.db_table)
+
+    total = 0
+    while True:
+        order_ids = list(Order.objects.filter(status__in=FINISHED_STATUS, update_time__lt=deadline)
+                         .order_by("id").values_list("id", flat=True)[:batch_size])
+        if not order_ids:
+            break
+
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        try:
+            # 复制和删除在同一个事务中, 不会出现订单丢失或者重复
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("INSERT INTO %s (%s) SELECT %s FROM %s WHERE id IN (%s)" % (
+                    cold_table, columns, columns, hot_table, placeholders), order_ids)
+                cursor.execute("DELETE FROM %s WHERE id IN (%s)" % (hot_table, placeholders), order_ids)
+        except Exception as e:
+            logger.error(e)
+            break
+
+        total += len(order_ids)
+        if len(order_ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return total
@@ -0,0 +1,90 @@
+import datetime
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from homes.models import Area, House
+from order.models import Order
+from users.models import User
+
+
+class Rollback(Exception):
+    """用于回滚基准测试造的数据"""
+
+
+class Command(BaseCommand):
+    """
+    对比房东订单列表的两种查询方式:
+    旧: 先查出房东的全部房屋, 再用 house_id__in 查询订单
+    新: 直接 house__user=user 连接查询, 并用 values() 投影
+    用法: python manage.py bench_landlord_orders --sizes 10 1000 10000
+    """
+    help = "房东订单列表查询的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10, 1000, 10000], help="每个房东的房屋数")
+        parser.add_argument("--orders", type=int, default=1, help="每间房屋的订单数")
+        parser.add_argument("--repeat", type=int, default=5, help="每种查询重复执行的次数")
+
+    def handle(self, *args, **options):
+        self.stdout.write("%8s %8s %12s %12s %10s %10s" % ("houses", "orders", "old(ms)", "new(ms)", "old(sql)", "new(sql)"))
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    landlord = self.seed(size, options["orders"])
+                    old_ms, old_sql = self.measure(self.old_query, landlord, options["repeat"])
+                    new_ms, new_sql = self.measure(self.new_query, landlord, options["repeat"])
+                    self.stdout.write("%8d %8d %12.2f %12.2f %10d %10d" % (
+                        size, size * options["orders"], old_ms, new_ms, old_sql, new_sql))
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    @staticmethod
+    def seed(size, orders_per_house):
+        area = Area.objects.create(name="bench")
+        landlord = User.objects.create_user(username="bench_landlord", mobile="10000000000", password="bench")
+        custom = User.objects.create_user(username="bench_custom", mobile="10000000001", password="bench")
+        houses = [House(user=landlord, area=area, title="house%d" % i, price=100) for i in range(size)]
+        House.objects.bulk_create(houses, batch_size=500)
+        begin = datetime.date(2019, 1, 1)
+        orders = []
+        for house_id in House.objects.filter(user=landlord).values_list("id", flat=True):
+            for i in range(orders_per_house):
+                begin_date = begin + datetime.timedelta(days=i * 2)
+                orders.append(Order(user=custom, house_id=house_id, begin_date=begin_date,
+                                    end_date=begin_date + datetime.timedelta(days=1),
+                                    days=1, house_price=100, amount=100))
+        Order.objects.bulk_create(orders, batch_size=500)
+        return landlord
+
+    @staticmethod
+    def old_query(user):
+        houses = House.objects.filter(user=user)
+        house_ids = [house.id for house in houses]
+        orders = Order.objects.filter(house_id__in=house_ids).order_by("-create_time")
+        return [order.to_dict() for order in orders]
+
+    @staticmethod
+    def new_query(user):
+        orders = Order.objects.filter(house__user=user).order_by("-create_time").values(*Order.ORDER_LIST_FIELDS)
+        return [Order.values_to_dict(order) for order in orders]
+
+    @staticmethod
+    def measure(func, user, repeat):
+        # 不使用 CaptureQueriesContext, 它最多只记录 9000 条查询
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        connection.queries_log = deque()
+        try:
+            func(user)
+            queries = len(connection.queries_log)
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+            connection.queries_log = deque(maxlen=connection.queries_limit)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(user)
+        return (time.perf_counter() - start) * 1000 / repeat, queries
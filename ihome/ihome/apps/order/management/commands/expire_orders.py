@@ -0,0 +1,78 @@
+import datetime
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from order import state_machine
+from order.models import Order
+from utils import constants
+
+logger = logging.getLogger("django")
+
+
+class Command(BaseCommand):
+    """
+    将超时未接单的订单批量设置为已拒单(或已取消)
+    每一批先按 status 索引取出一批订单id, 再用一条带 status 条件的 UPDATE 修改,
+    每批单独提交, 不会长时间锁住 tb_order; 中途退出后重新执行即可继续处理剩下的订单
+    用法:
+        python manage.py expire_orders                     # 处理一轮后退出, 可放到 crontab 中
+        python manage.py expire_orders --loop --interval 60 # 常驻进程, 每60秒处理一轮
+    """
+    help = "批量处理超时未接单的订单"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timeout", type=int, default=constants.ORDER_WAIT_ACCEPT_TIMEOUT,
+                            help="待接单超过多少秒算超时")
+        parser.add_argument("--batch-size", type=int, default=constants.ORDER_EXPIRE_BATCH_SIZE,
+                            help="每批处理的订单数")
+        parser.add_argument("--action", choices=["reject", "cancel"], default="reject",
+                            help="超时订单按拒单还是取消处理")
+        parser.add_argument("--pause", type=float, default=0.1, help="每批之间暂停的秒数, 给其他事务让出锁")
+        parser.add_argument("--loop", action="store_true", help="常驻运行")
+        parser.add_argument("--interval", type=int, default=60, help="常驻运行时每轮之间的秒数")
+
+    def handle(self, *args, **options):
+        while True:
+            count = expire_orders(options["timeout"], options["batch_size"],
+                                  options["action"], options["pause"])
+            self.stdout.write("%s 处理超时订单 %d 个" % (timezone.now().strftime("%Y-%m-%d %H:%M:%S"), count))
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+
+def expire_orders(timeout, batch_size, action, pause=0):
+    """
+    分批处理超时订单
+    :param timeout: 超时秒数
+    :param batch_size: 每批条数
+    :param action: 订单状态机中的动作, reject 或 cancel
+    :param pause: 每批之间暂停的秒数
+    :return: 处理的订单总数
+    """
+    deadline = timezone.now() - datetime.timedelta(seconds=timeout)
+    wait_accept = Order.ORDER_STATUS["WAIT_ACCEPT"]
+    total = 0
+    while True:
+        # 走 status 索引, 按主键顺序取一批, 只取 id
+        order_ids = list(Order.objects.filter(status=wait_accept, create_time__lt=deadline)
+                         .order_by("id").values_list("id", flat=True)[:batch_size])
+        if not order_ids:
+            break
+
+        try:
+            # 状态机的 UPDATE 带有 status 条件, 房东在这期间已经处理过的订单不会被覆盖
+            count = state_machine.transition_many(order_ids, action, comment="房东超时未接单")
+        except Exception as e:
+            logger.error(e)
+            break
+
+        total += count
+        if len(order_ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return total
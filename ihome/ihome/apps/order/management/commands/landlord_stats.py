@@ -0,0 +1,57 @@
+import datetime
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from order import analytics
+
+
+class Command(BaseCommand):
+    """
+    房东的入住率和收入统计
+    用法:
+        python manage.py landlord_stats --user-id 1 --year 2019   # 计算并输出某个房东的统计数据
+        python manage.py landlord_stats --bench 100000            # 用随机生成的订单测试汇总的耗时
+    """
+    help = "房东的入住率和收入统计"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-id", type=int, help="房东的用户id")
+        parser.add_argument("--year", type=int, default=datetime.date.today().year, help="年份")
+        parser.add_argument("--bench", type=int, help="随机生成多少个订单测试汇总的耗时")
+        parser.add_argument("--houses", type=int, default=100, help="测试时房东的房屋数")
+
+    def handle(self, *args, **options):
+        if options["bench"]:
+            return self.bench(options["bench"], options["houses"], options["year"])
+
+        if not options["user_id"]:
+            raise CommandError("请指定 --user-id")
+
+        start = time.perf_counter()
+        data = analytics.compute_landlord_stats(options["user_id"], options["year"])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write("%-8s %-8s %8s %10s %12s" % ("house", "month", "nights", "occupancy", "revenue"))
+        for house in data["houses"]:
+            for month, nights, occupancy, revenue in zip(data["months"], house["nights"],
+                                                         house["occupancy"], house["revenue"]):
+                self.stdout.write("%-8d %-8s %8d %10.2f %12d" % (house["house_id"], month, nights, occupancy, revenue))
+        self.stdout.write("耗时 %.2f ms" % elapsed)
+
+    def bench(self, count, houses, year):
+        house_ids = np.arange(1, houses + 1, dtype=np.int64)
+        first_day = datetime.date(year, 1, 1)
+        rows = []
+        for _ in range(count):
+            begin = first_day + datetime.timedelta(days=random.randint(-10, 364))
+            days = random.randint(1, 14)
+            rows.append((random.randint(1, houses), begin, begin + datetime.timedelta(days=days), days * 10000))
+
+        start = time.perf_counter()
+        nights, revenue, _ = analytics.aggregate(rows, house_ids, year)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stdout.write("%d 个订单, %d 间房屋, 汇总耗时 %.2f ms, 总入住天数 %d, 总收入 %d" % (
+            count, houses, elapsed, nights.sum(), revenue.sum()))
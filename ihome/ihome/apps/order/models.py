@@ -5,8 +5,11 @@ from django.db import models
 from utils.model import BaseModel
 
 
-class Order(BaseModel):
-    """订单"""
+class AbstractOrder(BaseModel):
+    """
+    订单和归档订单共同的字段, 两张表的列完全相同, 归档时按字段列表 INSERT ... SELECT
+    增加订单字段时只修改这里, 两张表同时迁移
+    """
     ORDER_STATUS = {
         "WAIT_ACCEPT": 0,  # 待接单,
         "WAIT_PAYMENT": 1,  # 待支付
@@ -36,7 +39,10 @@ class Order(BaseModel):
             (6, "REJECTED")  # 已拒单
         )
 
-    user = models.ForeignKey("users.User", related_name="orders", on_delete=models.CASCADE, verbose_name="下订单的用户编号")
+    # 已取消和已拒单的订单不再占用房屋的入住日期
+    ORDER_STATUS_INACTIVE = (ORDER_STATUS["CANCELED"], ORDER_STATUS["REJECTED"])
+
+    user = models.ForeignKey("users.User", related_name="%(class)ss", on_delete=models.CASCADE, verbose_name="下订单的用户编号")
     house = models.ForeignKey("homes.House", on_delete=models.CASCADE, verbose_name="预订的房间编号")
     begin_date = models.DateField(null=False, verbose_name="预订的起始时间")
     end_date = models.DateField(null=False, verbose_name="结束时间")
@@ -46,8 +52,29 @@ class Order(BaseModel):
     status = models.SmallIntegerField(choices=ORDER_STATUS_CHOICES, default=0, db_index=True, verbose_name="订单状态")
     comment = models.TextField(null=True, verbose_name="订单的评论信息或者拒单原因")
 
+    class Meta:
+        abstract = True
+
+
+class Order(AbstractOrder):
+    """订单"""
+    # 订单列表需要的字段, 用于 values() 直接投影, 避免逐个加载模型对象和关联的房屋
+    ORDER_LIST_FIELDS = ("id", "house__title", "house__index_image_url", "begin_date", "end_date",
+                         "create_time", "days", "amount", "status", "comment")
+
     class Meta:
         db_table = "tb_order"
+        indexes = [
+            # 下单时的冲突检查: house_id 等值, end_date 范围
+            # 查询的日期都在今天之后, end_date > 开始日期 只命中未结束的订单, begin_date < 结束日期 会命中几乎所有历史订单
+            models.Index(fields=["house", "end_date", "begin_date"], name="tb_order_house_date_idx"),
+            # 搜索时查询日期冲突的订单, 按 end_date 范围查找, status 不在索引中, 命中的订单需要回表
+            models.Index(fields=["end_date", "begin_date", "house"], name="tb_order_date_house_idx"),
+            # 房客订单列表: user_id 等值后按 create_time 排序
+            models.Index(fields=["user", "create_time"], name="tb_order_user_ctime_idx"),
+            # 房屋详情的评论: house_id, status 等值后按 update_time 排序, comment 是 TEXT 不能放进索引
+            models.Index(fields=["house", "status", "update_time"], name="tb_order_house_st_utime_idx"),
+        ]
 
     def to_dict(self):
         """将订单信息转换为字典数据"""
@@ -64,3 +91,48 @@ class Order(BaseModel):
             "comment": self.comment if self.comment else ""
         }
         return order_dict
+
+    @staticmethod
+    def values_to_dict(values):
+        """将 ORDER_LIST_FIELDS 投影出的一行数据转换为和 to_dict 相同的字典"""
+        index_image_url = values["house__index_image_url"]
+        order_dict = {
+            "order_id": values["id"],
+            "title": values["house__title"],
+            "img_url": settings.QINIU_URL + index_image_url if index_image_url else "",
+            "start_date": values["begin_date"].strftime("%Y-%m-%d"),
+            "end_date": values["end_date"].strftime("%Y-%m-%d"),
+            "ctime": values["create_time"].strftime("%Y-%m-%d %H:%M"),
+            "days": values["days"],
+            "amount": values["amount"],
+            "status": Order.ORDER_STATUS_ENUM[values["status"]],
+            "comment": values["comment"] if values["comment"] else ""
+        }
+        return order_dict
+
+
+class OrderArchive(AbstractOrder):
+    """
+    归档的历史订单, 字段和 Order 相同
+    已完成、已取消、已拒单并且很久没有变化的订单由 archive_orders 命令从 tb_order 移到这里,
+    保证 tb_order 中只有近期的订单, 归档时原样复制订单的id和时间
+    """
+
+    class Meta:
+        db_table = "tb_order_archive"
+        indexes = [
+            models.Index(fields=["user", "create_time"], name="tb_order_arc_user_ctime_idx"),
+        ]
+
+
+def order_history(fields, order_by, **filters):
+    """
+    查询包括归档订单在内的全部订单, 两张表的结果用 UNION ALL 合并
+    :param fields: values() 投影的字段
+    :param order_by: 合并后的排序字段, 必须在 fields 中
+    :param filters: 两张表共同的查询条件
+    :return: 字典组成的 QuerySet
+    """
+    hot = Order.objects.filter(**filters).values(*fields)
+    cold = OrderArchive.objects.filter(**filters).values(*fields)
+    return hot.union(cold, all=True).order_by(*order_by)
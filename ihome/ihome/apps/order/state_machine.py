@@ -0,0 +1,122 @@
+"""
+订单状态机
+
+所有订单状态的修改都通过这里完成:
+    1. 允许的状态转换都定义在 TRANSITIONS 中
+    2. 每次转换只执行一条带原状态条件的 UPDATE, 只修改发生变化的字段,
+       并发修改同一个订单时只有一个会成功, 不会互相覆盖
+    3. 转换成功后的附加操作(计数器、缓存失效等)通过 register 注册, 统一在这里调用
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from homes import booking_calendar, house_cache
+from homes.models import House
+from order.models import Order
+
+# 动作: (原状态, 目标状态)
+TRANSITIONS = {
+    "accept": (Order.ORDER_STATUS["WAIT_ACCEPT"], Order.ORDER_STATUS["WAIT_COMMENT"]),  # 接单
+    "reject": (Order.ORDER_STATUS["WAIT_ACCEPT"], Order.ORDER_STATUS["REJECTED"]),  # 拒单
+    "cancel": (Order.ORDER_STATUS["WAIT_ACCEPT"], Order.ORDER_STATUS["CANCELED"]),  # 取消
+    "comment": (Order.ORDER_STATUS["WAIT_COMMENT"], Order.ORDER_STATUS["COMPLETE"]),  # 评价并完成订单
+}
+
+# 动作: [转换成功后调用的函数]
+_handlers = defaultdict(list)
+
+
+def register(action, handler=None):
+    """
+    注册状态转换成功后的处理函数, 可以当装饰器使用
+    处理函数的参数为 (order_ids, fields), 和状态修改在同一个事务中执行
+    """
+    if action not in TRANSITIONS:
+        raise ValueError("未知的订单动作: %s" % action)
+
+    def decorator(func):
+        _handlers[action].append(func)
+        return func
+
+    if handler is not None:
+        return decorator(handler)
+    return decorator
+
+
+def transition(order_id, action, filters=None, **fields):
+    """
+    修改单个订单的状态
+    :param order_id: 订单id
+    :param action: TRANSITIONS 中的动作
+    :param filters: 额外的条件, 比如校验订单所属的房东
+    :param fields: 需要同时修改的其他字段, 比如 comment
+    :return: 是否修改成功
+    """
+    return transition_many([order_id], action, filters, **fields) == 1
+
+
+def transition_many(order_ids, action, filters=None, **fields):
+    """
+    批量修改订单的状态, 只有处于原状态的订单会被修改
+    :return: 修改成功的订单数
+    """
+    from_status, to_status = TRANSITIONS[action]
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+
+    if len(order_ids) == 1:
+        queryset = Order.objects.filter(id=order_ids[0], status=from_status)
+    else:
+        queryset = Order.objects.filter(id__in=order_ids, status=from_status)
+    if filters:
+        queryset = queryset.filter(**filters)
+
+    fields["status"] = to_status
+    fields["update_time"] = timezone.now()
+
+    handlers = _handlers[action]
+    if not handlers:
+        # 没有附加操作时直接执行 UPDATE, 只需要一次数据库往返
+        return queryset.update(**fields)
+
+    with transaction.atomic():
+        count = queryset.update(**fields)
+        if count:
+            if count < len(order_ids):
+                # 部分订单已经被其他请求修改, 只把本次修改成功的订单交给处理函数
+                order_ids = list(Order.objects.filter(id__in=order_ids, status=to_status,
+                                                      update_time=fields["update_time"])
+                                 .values_list("id", flat=True))
+            for handler in handlers:
+                handler(order_ids, fields)
+    return count
+
+
+@register("comment")
+def complete_order(order_ids, fields):
+    """订单完成后更新房屋的订单数和评论数, 并在事务提交后删除首页和房屋详情的缓存"""
+    house_counts = Counter(Order.objects.filter(id__in=order_ids).values_list("house_id", flat=True))
+
+    # 按增加的数量分组, 每组一条 UPDATE, 用 F() 在数据库中原子地累加
+    houses_by_count = defaultdict(list)
+    for house_id, count in house_counts.items():
+        houses_by_count[count].append(house_id)
+    for count, house_ids in houses_by_count.items():
+        values = {"order_count": F("order_count") + count}
+        if fields.get("comment"):
+            values["comment_count"] = F("comment_count") + count
+        House.objects.filter(id__in=house_ids).update(**values)
+
+    house_cache.invalidate(house_counts)
+
+
+@register("reject")
+@register("cancel")
+def release_dates(order_ids, fields):
+    """拒单和取消的订单不再占用日期, 事务提交后删除对应月份的预订日历缓存"""
+    bookings = list(Order.objects.filter(id__in=order_ids).values_list("house_id", "begin_date", "end_date"))
+    transaction.on_commit(lambda: booking_calendar.invalidate(bookings))
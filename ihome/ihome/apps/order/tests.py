@@ -1,3 +1,188 @@
+import datetime
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from homes.models import Area, House
+from order.management.commands.archive_orders import archive_orders
+from order.models import Order, OrderArchive
+from users.models import User
+
+
+class QueryPlanTest(TestCase):
+    """
+    用 EXPLAIN 检查订单和房屋的主要查询都能用上索引, 不会全表扫描
+    """
+    HOUSE_COUNT = 200
+    ORDERS_PER_HOUSE = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        areas = [Area.objects.create(name="area%d" % i) for i in range(10)]
+        cls.landlord = User.objects.create_user(username="landlord", mobile="13000000000", password="password")
+        cls.custom = User.objects.create_user(username="custom", mobile="13000000001", password="password")
+        others = [User.objects.create_user(username="user%d" % i, mobile="1310000%04d" % i, password="password")
+                  for i in range(20)]
+        House.objects.bulk_create([House(user=cls.landlord if i % 20 == 0 else others[i % 20], area=areas[i % 10],
+                                         title="house%d" % i, price=i * 100, order_count=i % 7)
+                                   for i in range(cls.HOUSE_COUNT)], batch_size=100)
+        cls.house = House.objects.filter(user=cls.landlord).first()
+        cls.area = areas[0]
+
+        # 订单日期分散在三年里, 查询的日期范围只会命中很少的订单
+        first_day = datetime.date(2018, 1, 1)
+        orders = []
+        for house_id in House.objects.values_list("id", flat=True):
+            for i in range(cls.ORDERS_PER_HOUSE):
+                begin_date = first_day + datetime.timedelta(days=(house_id * 37 + i * 101) % 1000)
+                orders.append(Order(user=cls.custom if i == 0 else others[(house_id + i) % 20], house_id=house_id,
+                                    begin_date=begin_date, end_date=begin_date + datetime.timedelta(days=2),
+                                    days=2, house_price=100, amount=200, status=i % 7,
+                                    comment="comment" if i % 7 == 4 else None))
+        Order.objects.bulk_create(orders, batch_size=100)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute("ANALYZE TABLE tb_order, tb_house")
+            elif connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+
+    def assertNotFullScan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute("EXPLAIN " + sql, params)
+                columns = [column[0] for column in cursor.description]
+                for row in cursor.fetchall():
+                    plan = dict(zip(columns, row))
+                    self.assertNotEqual(plan["type"], "ALL", "全表扫描 %s: %s" % (plan["table"], sql))
+            elif connection.vendor == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if detail.startswith("SCAN") and "INDEX" not in detail:
+                        self.fail("全表扫描 %s: %s" % (detail, sql))
+            else:
+                self.skipTest("不支持的数据库 %s" % connection.vendor)
+
+    def test_order_conflict_check(self):
+        start_date, end_date = datetime.date(2019, 3, 1), datetime.date(2019, 3, 5)
+        self.assertNotFullScan(Order.objects.filter(house=self.house, begin_date__lt=end_date, end_date__gt=start_date)
+                               .exclude(status__in=Order.ORDER_STATUS_INACTIVE))
+
+    def test_search_conflict_orders(self):
+        start_date, end_date = datetime.date(2019, 3, 1), datetime.date(2019, 3, 5)
+        self.assertNotFullScan(Order.objects.filter(begin_date__lt=end_date, end_date__gt=start_date)
+                               .exclude(status__in=Order.ORDER_STATUS_INACTIVE).values_list("house_id", flat=True))
+
+    def test_custom_order_list(self):
+        self.assertNotFullScan(Order.objects.filter(user=self.custom).order_by("-create_time")
+                               .values(*Order.ORDER_LIST_FIELDS))
+
+    def test_landlord_order_list(self):
+        self.assertNotFullScan(Order.objects.filter(house__user=self.landlord).order_by("-create_time")
+                               .values(*Order.ORDER_LIST_FIELDS))
+
+    def test_house_comments(self):
+        self.assertNotFullScan(Order.objects.filter(house=self.house, status=Order.ORDER_STATUS["COMPLETE"],
+                                                    comment__isnull=False).order_by("-update_time")[0:30])
+
+    def test_house_search(self):
+        for order_by in ("price", "-price", "-order_count", "-create_time"):
+            self.assertNotFullScan(House.objects.filter(area=self.area).order_by(order_by)[0:2])
+
+
+class FutureSearchPlanTest(TestCase):
+    """
+    订单大部分已经结束, 搜索和下单查询的是今天之后的日期
+    日期冲突的查询要按 end_date 范围使用索引, 只扫描未结束的订单, 不能随历史订单增长
+    """
+    HOUSE_COUNT = 50
+    PAST_ORDERS_PER_HOUSE = 40
+    FUTURE_ORDERS_PER_HOUSE = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(name="area")
+        landlord = User.objects.create_user(username="landlord", mobile="13000000000", password="password")
+        custom = User.objects.create_user(username="custom", mobile="13000000001", password="password")
+        House.objects.bulk_create([House(user=landlord, area=area, title="house%d" % i, price=100)
+                                   for i in range(cls.HOUSE_COUNT)])
+        cls.house = House.objects.first()
+
+        past_day, future_day = datetime.date(2016, 1, 1), datetime.date(2030, 1, 1)
+        orders = []
+        for house_id in House.objects.values_list("id", flat=True):
+            begin_dates = [past_day + datetime.timedelta(days=i * 30) for i in range(cls.PAST_ORDERS_PER_HOUSE)]
+            begin_dates += [future_day + datetime.timedelta(days=(house_id + i * 7) % 60)
+                            for i in range(cls.FUTURE_ORDERS_PER_HOUSE)]
+            orders.extend(Order(user=custom, house_id=house_id, begin_date=begin_date,
+                                end_date=begin_date + datetime.timedelta(days=2), days=2, house_price=100,
+                                amount=200, status=Order.ORDER_STATUS["PAID"]) for begin_date in begin_dates)
+        Order.objects.bulk_create(orders, batch_size=100)
+        cls.order_count = len(orders)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute("ANALYZE TABLE tb_order")
+            elif connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+
+    def assertEndDateRange(self, queryset):
+        """tb_order 的查询使用以 end_date 为范围条件的索引, 扫描的行数远小于全部订单"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute("EXPLAIN " + sql, params)
+                columns = [column[0] for column in cursor.description]
+                plans = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                plan = [plan for plan in plans if plan["table"] == "tb_order"][0]
+                self.assertLess(plan["rows"], self.order_count / 4, "扫描的订单过多: %s" % sql)
+            elif connection.vendor == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                details = [row[-1] for row in cursor.fetchall()]
+                self.assertTrue(any("tb_order" in detail and "end_date>?" in detail for detail in details),
+                                "没有按 end_date 范围使用索引 %s: %s" % (details, sql))
+            else:
+                self.skipTest("不支持的数据库 %s" % connection.vendor)
+
+    def test_search_future_dates(self):
+        start_date, end_date = datetime.date(2030, 1, 10), datetime.date(2030, 1, 15)
+        self.assertEndDateRange(Order.objects.filter(begin_date__lt=end_date, end_date__gt=start_date)
+                                .exclude(status__in=Order.ORDER_STATUS_INACTIVE).values_list("house_id", flat=True))
+
+    def test_order_conflict_future_dates(self):
+        start_date, end_date = datetime.date(2030, 1, 10), datetime.date(2030, 1, 15)
+        self.assertEndDateRange(Order.objects.filter(house=self.house, begin_date__lt=end_date,
+                                                     end_date__gt=start_date)
+                                .exclude(status__in=Order.ORDER_STATUS_INACTIVE))
+
+
+class ArchiveOrdersTest(TestCase):
+    """
+    归档订单时两张表的列一一对应, 归档后的数据和原订单相同
+    """
+
+    def test_archive_same_columns(self):
+        self.assertEqual([field.column for field in Order._meta.concrete_fields],
+                         [field.column for field in OrderArchive._meta.concrete_fields])
+
+    def test_archive_finished_orders(self):
+        area = Area.objects.create(name="area")
+        user = User.objects.create_user(username="custom", mobile="13000000001", password="password")
+        house = House.objects.create(user=user, area=area, title="house", price=100)
+        begin_date = datetime.date(2019, 1, 1)
+        finished = Order.objects.create(user=user, house=house, begin_date=begin_date, end_date=begin_date,
+                                        days=1, house_price=100, amount=100,
+                                        status=Order.ORDER_STATUS["COMPLETE"], comment="comment")
+        paid = Order.objects.create(user=user, house=house, begin_date=begin_date, end_date=begin_date,
+                                    days=1, house_price=100, amount=100, status=Order.ORDER_STATUS["PAID"])
+        expected = Order.objects.filter(id=finished.id).values().get()
+
+        count = archive_orders(timezone.now() + datetime.timedelta(days=1), 100)
 
-# Create your tests here.
+        self.assertEqual(count, 1)
+        self.assertEqual(list(Order.objects.values_list("id", flat=True)), [paid.id])
+        self.assertEqual(OrderArchive.objects.filter(id=finished.id).values().get(), expected)
+        self.assertEqual(list(user.orderarchives.values_list("id", flat=True)), [finished.id])
@@ -4,12 +4,16 @@ import logging
 
 from django import http
 from django.utils.decorators import method_decorator
+from django.db import transaction
 from django.views import View
 from django_redis import get_redis_connection
 
-from apps.homes.models import House
-from apps.order.models import Order
-from utils.decorators import login_required
+from homes import booking_calendar
+from homes.models import House
+from order import analytics, state_machine
+from order.models import Order, order_history
+from utils import constants
+from utils.decorators import idempotent, login_required
 from utils.response_code import RET
 
 logger = logging.getLogger("django")
@@ -35,17 +39,21 @@ class OrdersView(View):
 
         if role == "custom":
             # 查询当前自己下了哪些订单
-            orders = Order.objects.filter(user=user).order_by("-create_time")
+            filters = {"user": user}
         else:
-            # 查询自己房屋都有哪些订单
-            houses = House.objects.filter(user=user)
-            house_ids = [house.id for house in houses]
-            orders = Order.objects.filter(house_id__in=house_ids).order_by("-create_time")
+            # 查询自己房屋都有哪些订单, 直接连接房屋表, 一次查询完成
+            filters = {"house__user": user}
 
-        orders_dict = [order.to_dict() for order in orders]
-        print(orders_dict)
+        try:
+            # 只投影返回需要的字段, 不再逐个加载订单和房屋对象, 归档的历史订单一起查询
+            orders = order_history(Order.ORDER_LIST_FIELDS, ["-create_time"], **filters)
+            orders_dict = [Order.values_to_dict(order) for order in orders]
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询错误"})
         return http.JsonResponse({"errno": RET.OK, "errmsg": "发布成功", "data": {"orders": orders_dict}})
 
+    @method_decorator(idempotent)
     def post(self, request):
         # 获取到当前用户的id
         user = request.user
@@ -84,7 +92,7 @@ class OrdersView(View):
         # 查询是否存在冲突的订单
         try:
             filters = {"house": house, "begin_date__lt": end_date, "end_date__gt": start_date}
-            count = Order.objects.filter(**filters).count()
+            count = Order.objects.filter(**filters).exclude(status__in=Order.ORDER_STATUS_INACTIVE).count()
         except Exception as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询错误"})
@@ -109,6 +117,12 @@ class OrdersView(View):
             logger.error(e)
             return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库保存失败"})
 
+        # 删除这几天所在月份的预订日历缓存
+        try:
+            booking_calendar.invalidate([(house.id, start_date.date(), end_date.date())])
+        except Exception as e:
+            logger.error(e)
+
         return http.JsonResponse({"errno": RET.OK, "errmsg": "发布成功", "data": {"order_id": order.pk}})
 
 
@@ -125,36 +139,135 @@ class OrdersStatusView(View):
         if action not in ("accept", "reject"):
             return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
 
+        fields = {}
+        if action == "reject":
+            # 获取拒单原因
+            reason = dict_data.get("reason")
+            if not reason:
+                return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "未填写拒绝原因"})
+            fields["comment"] = reason
+
+        # 一条 UPDATE 完成校验和修改: 订单必须是待接单状态, 并且房屋属于当前用户
         try:
-            order = Order.objects.filter(id=order_id, status=Order.ORDER_STATUS["WAIT_ACCEPT"]).first()
-            house = order.house
+            filters = {"house__in": House.objects.filter(user=user).values("id")}
+            applied = state_machine.transition(order_id, action, filters, **fields)
         except Exception as e:
             logger.error(e)
-            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "查询数据错误"})
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "保存订单状态失败"})
 
-        # 判断订单是否存在并且当前房屋的用户id是当前用户的id
-        if not order or house.user != user:
+        if not applied:
             return http.JsonResponse({"errno": RET.NODATA, "errmsg": "数据有误"})
 
-        if action == "accept":
-            # 接单
-            order.status = Order.ORDER_STATUS["WAIT_COMMENT"]
-        elif action == "reject":
-            # 获取拒单原因
-            reason = dict_data.get("reason")
-            if not reason:
-                return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "未填写拒绝原因"})
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "ok"})
 
 
-            # 设置状态为拒单并且设置拒单原因
-            order.status = Order.ORDER_STATUS["REJECTED"]
-            order.comment = reason
+class OrdersBatchStatusView(View):
+    """
+    批量接单和拒单
+    """
+    @method_decorator(login_required)
+    def put(self, request):
+        user = request.user
+
+        dict_data = json.loads(request.body.decode())
+        order_ids = dict_data.get('order_ids')
+        action = dict_data.get('action')
+        reason = dict_data.get("reason")
+
+        if action not in ("accept", "reject"):
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        if action == "reject" and not reason:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "未填写拒绝原因"})
+
+        if not isinstance(order_ids, list):
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
 
-        # 保存到数据库
         try:
-            order.save()
+            order_ids = {int(order_id) for order_id in order_ids}
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        if not order_ids or len(order_ids) > constants.ORDER_BATCH_STATUS_MAX_COUNT:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        wait_accept = Order.ORDER_STATUS["WAIT_ACCEPT"]
+        fields = {"comment": reason} if action == "reject" else {}
+
+        try:
+            with transaction.atomic():
+                # 一次连接查询校验订单是否属于当前房东的房屋, 并锁住这些订单
+                statuses = dict(Order.objects.select_for_update()
+                                .filter(id__in=order_ids, house__user=user).values_list("id", "status"))
+                accept_ids = [order_id for order_id, status in statuses.items() if status == wait_accept]
+                if accept_ids:
+                    # 一条带状态条件的 UPDATE 完成所有订单的状态修改
+                    state_machine.transition_many(accept_ids, action, **fields)
         except Exception as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.DBERR, "errmsg": "保存订单状态失败"})
 
-        return http.JsonResponse({"errno": RET.OK, "errmsg": "ok"})
\ No newline at end of file
+        results = []
+        for order_id in sorted(order_ids):
+            if order_id not in statuses:
+                result = "not_found"
+            elif statuses[order_id] != wait_accept:
+                result = "invalid_status"
+            else:
+                result = "ok"
+            results.append({"order_id": order_id, "result": result})
+
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "ok", "data": {"results": results}})
+
+
+class OrdersCommentView(View):
+    """
+    评价订单
+    """
+    @method_decorator(login_required)
+    def put(self, request, order_id):
+        user = request.user
+
+        dict_data = json.loads(request.body.decode())
+        comment = dict_data.get('comment')
+        if not comment:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        # 只能评价自己下的待评价订单, 评价后订单完成, 房屋的订单数和评论数在状态机中累加
+        try:
+            applied = state_machine.transition(order_id, "comment", {"user": user}, comment=comment)
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "保存评价失败"})
+
+        if not applied:
+            return http.JsonResponse({"errno": RET.NODATA, "errmsg": "数据有误"})
+
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "ok"})
+
+
+class OrdersStatsView(View):
+    """
+    房东的入住率和收入统计
+    """
+    @method_decorator(login_required)
+    def get(self, request):
+        user = request.user
+
+        try:
+            year = int(request.GET.get('year', datetime.date.today().year))
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        if not 1970 <= year <= 9998:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        try:
+            data = analytics.landlord_stats(user.id, year)
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询错误"})
+
+        return http.JsonResponse({"errno": RET.OK, "errmsg": "ok", "data": data})
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+from utils import check_account
+
+
+class Rollback(Exception):
+    """用于回滚基准测试造的数据"""
+
+
+def old_get_user_by_account(account):
+    """修改前的实现: 先按用户名查询, 查不到再按手机号查询"""
+    try:
+        user = User.objects.get(username=account)
+    except User.DoesNotExist:
+        try:
+            user = User.objects.get(mobile=account)
+        except User.DoesNotExist:
+            return None
+    return user
+
+
+class Command(BaseCommand):
+    """
+    统计登录时查询用户的数据库查询次数和耗时
+    用法: python manage.py bench_account_lookup --repeat 1000
+    """
+    help = "登录查询用户的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=1000, help="每种情况重复的次数")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username="13900000000", mobile="13900000000", password="password")
+                User.objects.create_user(username="bench_user", mobile="13900000001", password="password")
+                cases = [
+                    ("用户名登录", "bench_user"),
+                    ("手机号登录(用户名就是手机号)", "13900000000"),
+                    ("手机号登录(修改过用户名)", "13900000001"),
+                    ("账号不存在", "13900000002"),
+                ]
+                self.stdout.write("%-30s %8s %8s %10s %10s %10s" % (
+                    "case", "old(sql)", "new(sql)", "cached(sql)", "old(us)", "new(us)"))
+                for name, account in cases:
+                    check_account.clear_account_cache(account)
+                    old_sql, old_us = self.measure(old_get_user_by_account, account, options["repeat"])
+                    new_sql, new_us = self.measure(check_account.get_user_by_account, account, options["repeat"])
+                    # 模拟登录失败后同一个账号再次登录
+                    check_account.cache_failed_account(account, check_account.get_user_by_account(account))
+                    cached_sql, _ = self.measure(check_account.get_user_by_account, account, 1)
+                    check_account.clear_account_cache(account)
+                    self.stdout.write("%-30s %8d %8d %10d %10.1f %10.1f" % (
+                        name, old_sql, new_sql, cached_sql, old_us, new_us))
+                raise Rollback()
+        except Rollback:
+            pass
+
+    @staticmethod
+    def measure(func, account, repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            func(account)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(account)
+        return len(ctx.captured_queries), (time.perf_counter() - start) * 1000000 / repeat
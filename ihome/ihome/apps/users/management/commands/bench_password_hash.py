@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from users.models import User
+from utils import hashers
+
+# 算法名对应 settings.PASSWORD_HASHERS 中的类
+HASHER_CLASSES = {
+    "pbkdf2_sha256": "utils.hashers.PBKDF2PasswordHasher",
+    "bcrypt_sha256": "utils.hashers.BCryptSHA256PasswordHasher",
+    "argon2": "utils.hashers.Argon2PasswordHasher",
+}
+
+
+class Command(BaseCommand):
+    """
+    统计不同密码哈希策略下单核每秒能处理的登录数
+    策略的格式为 算法:成本, 例如 pbkdf2_sha256:36000 bcrypt_sha256:12 argon2:2
+    用法: python manage.py bench_password_hash --policies pbkdf2_sha256:36000 pbkdf2_sha256:10000 --threads 4
+    """
+    help = "密码哈希策略的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--policies", nargs="+",
+                            default=["pbkdf2_sha256:36000", "pbkdf2_sha256:20000", "pbkdf2_sha256:10000"],
+                            help="要测试的策略")
+        parser.add_argument("--logins", type=int, default=50, help="每种策略校验密码的次数")
+        parser.add_argument("--threads", type=int, default=0, help="大于0时同时测试线程池中并发校验的吞吐量")
+
+    def handle(self, *args, **options):
+        self.stdout.write("%-24s %12s %16s %16s" % ("policy", "ms/login", "logins/s/core", "pool logins/s"))
+        for policy in options["policies"]:
+            algorithm, _, cost = policy.partition(":")
+            if algorithm not in HASHER_CLASSES or not cost.isdigit():
+                raise CommandError("策略格式错误: %s" % policy)
+            with override_settings(PASSWORD_HASHERS=[HASHER_CLASSES[algorithm]],
+                                   PASSWORD_HASHER_COST={algorithm: int(cost)}, PASSWORD_HASHER_THREADS=0):
+                try:
+                    get_hasher().salt()
+                except ValueError as e:
+                    # 没有安装对应的库
+                    self.stdout.write("%-24s %s" % (policy, e))
+                    continue
+                user = User(username="bench", password=hashers.make_password("password"))
+                ms = self.measure(user, options["logins"], 1)
+                pool = self.measure(user, options["logins"], options["threads"]) if options["threads"] else None
+            self.stdout.write("%-24s %12.2f %16.1f %16s" % (
+                policy, ms, 1000 / ms, "%.1f" % (1000 / pool) if pool else "-"))
+        if options["threads"]:
+            self.stdout.write("CPU核数: %s, 线程池大小: %d" % (os.cpu_count(), options["threads"]))
+
+    @staticmethod
+    def measure(user, logins, threads):
+        """平均每次登录校验密码的毫秒数, threads 大于1时为并发校验的平均值"""
+        start = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(lambda _: hashers.check_password(user, "password"), range(logins)))
+        else:
+            results = [hashers.check_password(user, "password") for _ in range(logins)]
+        assert all(results)
+        return (time.perf_counter() - start) * 1000 / logins
@@ -0,0 +1,19 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from users.models import User
+from utils.sessions import bump_user_version
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """保存用户信息(包括修改密码)后, session中的用户快照失效"""
+    bump_user_version(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_handler(sender, request, user, **kwargs):
+    """退出登录后, 各进程中缓存的session立即失效"""
+    if user is not None:
+        bump_user_version(user.pk)
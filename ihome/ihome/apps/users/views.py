@@ -11,9 +11,12 @@ from django_redis import get_redis_connection
 from pymysql import DatabaseError
 
 # from libs.qiniuyun.qiniu_storage import storage
+from homes import house_cache
 from libs.qiniu.qiniu_storage import storage
 from users.models import User
-from utils.decorators import login_required
+from utils import hashers
+from utils.check_account import clear_account_cache
+from utils.decorators import idempotent, login_required, rate_limit
 from utils.param_checking import image_file
 from utils.response_code import RET
 
@@ -22,6 +25,7 @@ logger = logging.getLogger("django")
 
 class RegisterView(View):
 
+    @method_decorator(rate_limit("register", "mobile"))
     def post(self, request):
         # 一、接收参数---根据接口文档
         dict_data = json.loads(request.body.decode())
@@ -54,13 +58,16 @@ class RegisterView(View):
         save_data = {
             "username": mobile,
             "mobile": mobile,
-            "password": password
+            # 密码哈希按 settings 中的策略计算
+            "password": hashers.make_password(password)
         }
         try:
-            user = User.objects.create_user(**save_data)
+            user = User.objects.create(**save_data)
         except DatabaseError as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.DBERR, "errmsg": "注册失败"})
+        # 删除之前登录失败时缓存的"账号不存在"
+        clear_account_cache(mobile)
         # 状态保持
         login(request, user)
 
@@ -86,6 +93,7 @@ class LoginView(View):
         }
         return http.JsonResponse({"errno": RET.OK, "errmsg": "已登录", "data": data})
 
+    @method_decorator(rate_limit("login", "mobile"))
     def post(self, request):
         dict_data = json.loads(request.body.decode())
         mobile = dict_data.get('mobile')
@@ -149,6 +157,7 @@ class AvatarView(View):
     上传头像
     """
     @method_decorator(login_required)
+    @method_decorator(idempotent)
     def post(self, request):
         # 1、接收参数
         avatar = request.FILES.get("avatar")
@@ -174,6 +183,8 @@ class AvatarView(View):
         except DatabaseError as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.SERVERERR, "errmsg": "图片保存失败"})
+        # 房屋详情和首页中有房东的头像
+        house_cache.invalidate_user(request.user)
 
         data = {
             "avatar_url": settings.QINIU_URL + key
@@ -191,12 +202,16 @@ class ModifyNameView(View):
         username = dict_data.get("name")
 
         user = request.user
+        old_username = user.username
         try:
             user.username = username
             user.save()
         except DatabaseError as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.SERVERERR, "errmsg": "数据保存失败"})
+        clear_account_cache(old_username, username)
+        # 房屋详情中有房东的用户名
+        house_cache.invalidate_user(user)
 
         return http.JsonResponse({"errno":RET.OK, "errmsg": "修改成功"})
 
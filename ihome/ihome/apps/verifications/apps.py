@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class VerificationsConfig(AppConfig):
     name = 'verifications'
+
+    def ready(self):
+        # 进程启动时预先加载图片验证码的字体
+        from verifications.libs.captcha.captcha import captcha
+        captcha.warm_up()
@@ -0,0 +1,52 @@
+"""
+预先生成的图片验证码池
+
+验证码池是 verify_code redis 中的一个列表, 每一项为 "文字:图片内容", 每种图片编码使用单独的列表
+    1. refill_captcha_pool 命令在后台把池子补充到 IMAGE_CODE_POOL_SIZE 个
+    2. ImageCodeView 用 LPOP 取出一个, LPOP 是原子操作, 同一个验证码不会被取出两次
+池子为空或者redis出错时, 视图直接生成验证码
+"""
+import logging
+
+from django_redis import get_redis_connection
+
+from utils import constants
+from verifications.libs.captcha.captcha import captcha
+
+logger = logging.getLogger("django")
+
+
+def pool_key():
+    """当前图片编码的验证码池的key"""
+    return constants.IMAGE_CODE_POOL_REDIS_KEY % constants.IMAGE_CODE_ENCODING
+
+
+def pop_captcha():
+    """
+    从池子中取出一个验证码, 池子为空时直接生成
+    :return: (文字, 图片内容)
+    """
+    try:
+        item = get_redis_connection("verify_code").lpop(pool_key())
+    except Exception as e:
+        logger.error(e)
+        item = None
+    if item is None:
+        return captcha.generate_captcha(constants.IMAGE_CODE_ENCODING)
+    text, image = item.split(b":", 1)
+    return text.decode(), image
+
+
+def refill(size, batch_size, executor=None):
+    """
+    把池子补充到 size 个, 每次最多生成 batch_size 个
+    :param executor: 进程池, 为None时在当前进程中生成
+    :return: 本次加入池子的验证码数
+    """
+    redis_conn = get_redis_connection("verify_code")
+    count = min(size - redis_conn.llen(pool_key()), batch_size)
+    if count <= 0:
+        return 0
+    items = [text.encode() + b":" + image for text, image in captcha.generate_batch(count, executor, constants.IMAGE_CODE_ENCODING)]
+    redis_conn.rpush(pool_key(), *items)
+    return count
@@ -6,13 +6,48 @@
 import random
 import string
 import os.path
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 
+import numpy as np
 from PIL import Image
 from PIL import ImageFilter
+from PIL import features
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype
 
+FONT_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+DEFAULT_FONTS = tuple(os.path.join(FONT_DIR, font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf'])
+DEFAULT_FONT_SIZES = (65, 70, 75)
+
+# output encodings: name -> (Pillow format, content type, number of palette colors or None, save options)
+ENCODINGS = {
+    'jpeg': ('JPEG', 'image/jpeg', None, {}),
+    'jpeg-q50': ('JPEG', 'image/jpeg', None, {'quality': 50}),
+    'jpeg-q30': ('JPEG', 'image/jpeg', None, {'quality': 30}),
+    'png': ('PNG', 'image/png', None, {'optimize': True}),
+    'png-p32': ('PNG', 'image/png', 32, {}),
+    'png-p16': ('PNG', 'image/png', 16, {}),
+    'webp-q50': ('WEBP', 'image/webp', None, {'quality': 50, 'method': 4}),
+    'webp-q30': ('WEBP', 'image/webp', None, {'quality': 30, 'method': 4}),
+}
+DEFAULT_ENCODING = 'jpeg'
+
+# brightens the text mask: each value is scaled by 1.97, rounded to the nearest
+# integer and clipped to 255. the rounding is deliberate; how Pillow converts the
+# floats of point(lambda i: i * 1.97) depends on its version, so the table is not
+# equivalent to that lambda in general, it only matched it on the inputs checked.
+MASK_TABLE = [min(255, round(i * 1.97)) for i in range(256)]
+
+
+def available_encodings():
+    """The names in ENCODINGS this Pillow build can write, WebP needs libwebp."""
+    return [name for name, (fmt, _, _, _) in ENCODINGS.items() if fmt != 'WEBP' or features.check('webp')]
+
+
+def content_type(encoding):
+    return ENCODINGS[encoding or DEFAULT_ENCODING][1]
+
 
 class Bezier:
     def __init__(self):
@@ -43,13 +78,10 @@ class Bezier:
             return self.beziers[n]
         except KeyError:
             combinations = self.pascal_row(n - 1)
-            result = []
-            for t in self.tsequence:
-                tpowers = (t ** i for i in range(n))
-                upowers = ((1 - t) ** i for i in range(n - 1, -1, -1))
-                coefs = [c * a * b for c, a, b in zip(combinations,
-                                                      tpowers, upowers)]
-                result.append(coefs)
+            # one row of coefficients per t, shape (len(tsequence), n)
+            t = np.array(self.tsequence)[:, None]
+            powers = np.arange(n)
+            result = np.array(combinations) * t ** powers * (1 - t) ** powers[::-1]
             self.beziers[n] = result
             return result
 
@@ -59,6 +91,8 @@ class Captcha(object):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
         # self._captcha_path = os.path.join(self._dir, '..', 'static', 'captcha')
+        # loaded font objects, keyed by (font file, size), shared by all requests in the process
+        self._truetype_fonts = {}
 
     @staticmethod
     def instance():
@@ -66,14 +100,23 @@ class Captcha(object):
             Captcha._instance = Captcha()
         return Captcha._instance
 
-    def initialize(self, width=200, height=75, color=None, text=None, fonts=None):
-        # self.image = Image.new('RGB', (width, height), (255, 255, 255))
-        self._text = text if text else random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
-        self.fonts = fonts if fonts else \
-            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
-        self.width = width
-        self.height = height
-        self._color = color if color else self.random_color(0, 200, random.randint(220, 255))
+    @staticmethod
+    def random_text():
+        return random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
+
+    def truetype(self, name, size):
+        """Load a font from disk only the first time it is used."""
+        key = (name, size)
+        font = self._truetype_fonts.get(key)
+        if font is None:
+            font = self._truetype_fonts[key] = truetype(name, size)
+        return font
+
+    def warm_up(self, fonts=None, font_sizes=None):
+        """Load the fonts before the first request, call it at process startup."""
+        for name in fonts or DEFAULT_FONTS:
+            for size in font_sizes or DEFAULT_FONT_SIZES:
+                self.truetype(name, size)
 
     @staticmethod
     def random_color(start, end, opacity=None):
@@ -94,40 +137,39 @@ class Captcha(object):
     def smooth(image):
         return image.filter(ImageFilter.SMOOTH)
 
-    def curve(self, image, width=4, number=6, color=None):
+    def curve(self, image, color, width=4, number=6):
         dx, height = image.size
         dx /= number
         path = [(dx * i, random.randint(0, height))
                 for i in range(1, number)]
         bcoefs = self._bezier.make_bezier(number - 1)
-        points = []
-        for coefs in bcoefs:
-            points.append(tuple(sum([coef * p for coef, p in zip(coefs, ps)])
-                                for ps in zip(*path)))
-        Draw(image).line(points, fill=color if color else self._color, width=width)
+        points = bcoefs.dot(np.array(path))
+        Draw(image).line(points.ravel().tolist(), fill=color, width=width)
         return image
 
-    def noise(self, image, number=50, level=2, color=None):
+    @staticmethod
+    def noise(image, color, number=50, level=2):
         width, height = image.size
         dx = width / 10
         width -= dx
         dy = height / 10
         height -= dy
-        draw = Draw(image)
-        for i in range(number):
-            x = int(random.uniform(dx, width))
-            y = int(random.uniform(dy, height))
-            draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+        x, y = np.array([(random.uniform(dx, width), random.uniform(dy, height)) for _ in range(number)],
+                        dtype=int).T
+        # a line from (x, y) to (x + level, y) with width level covers these pixels,
+        # draw all of them in one call instead of one line per segment
+        offset_x, offset_y = np.meshgrid(np.arange(level + 1), np.arange(level) - (level - 1) // 2)
+        points = np.stack([(x[:, None] + offset_x.ravel()).ravel(), (y[:, None] + offset_y.ravel()).ravel()], axis=1)
+        Draw(image).point(points.ravel().tolist(), fill=color)
         return image
 
-    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
-        color = color if color else self._color
-        fonts = tuple([truetype(name, size)
+    def text(self, image, chars, fonts, color, font_sizes=None, drawings=None, squeeze_factor=0.75):
+        fonts = tuple([self.truetype(name, size)
                        for name in fonts
-                       for size in font_sizes or (65, 70, 75)])
+                       for size in font_sizes or DEFAULT_FONT_SIZES])
         draw = Draw(image)
         char_images = []
-        for c in self._text:
+        for c in chars:
             font = random.choice(fonts)
             c_width, c_height = draw.textsize(c, font=font)
             char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
@@ -144,7 +186,7 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
-            mask = char_image.convert('L').point(lambda i: i * 1.97)
+            mask = char_image.convert('L').point(MASK_TABLE)
             image.paste(char_image,
                         (offset, int((height - c_height) / 2)),
                         mask)
@@ -187,32 +229,83 @@ class Captcha(object):
         return image.rotate(
             random.uniform(-angle, angle), Image.BILINEAR, expand=1)
 
-    def captcha(self, path=None, fmt='JPEG'):
-        """Create a captcha.
+    def draw(self, text=None, width=200, height=75, color=None, fonts=None):
+        """Draw a captcha image.
+
+        Everything that differs between two captchas is passed in or kept in
+        local variables, so one instance can draw in many threads at once.
 
         Args:
-            path: save path, default None.
-            fmt: image format, PNG / JPEG.
+            text: the characters to draw, random when None.
+            width, height: image size.
+            color: text, curve and noise color, random when None.
+            fonts: font files, DEFAULT_FONTS when None.
         Returns:
-            A tuple, (text, StringIO.value).
-            For example:
-                ('JGW9', '\x89PNG\r\n\x1a\n\x00\x00\x00\r...')
-
+            A tuple, (text, PIL image).
         """
-        image = Image.new('RGB', (self.width, self.height), (255, 255, 255))
+        chars = text if text else self.random_text()
+        color = color if color else self.random_color(0, 200, random.randint(220, 255))
+        image = Image.new('RGB', (width, height), (255, 255, 255))
         image = self.background(image)
-        image = self.text(image, self.fonts, drawings=['warp', 'rotate', 'offset'])
-        image = self.curve(image)
-        image = self.noise(image)
+        image = self.text(image, chars, fonts or DEFAULT_FONTS, color, drawings=['warp', 'rotate', 'offset'])
+        image = self.curve(image, color)
+        image = self.noise(image, color)
         image = self.smooth(image)
-        text = "".join(self._text)
+        return "".join(chars), image
+
+    @staticmethod
+    def encode(image, encoding=None):
+        """Encode an image with one of ENCODINGS, DEFAULT_ENCODING when None."""
+        fmt, _, colors, options = ENCODINGS[encoding or DEFAULT_ENCODING]
+        if colors:
+            # fast octree is several times faster than the default median cut at almost the same size
+            image = image.quantize(colors, method=Image.FASTOCTREE)
         out = BytesIO()
-        image.save(out, format=fmt)
-        return text, out.getvalue()
+        image.save(out, format=fmt, **options)
+        return out.getvalue()
+
+    def render(self, text=None, width=200, height=75, color=None, fonts=None, encoding=None):
+        """Create a captcha.
+
+        Args:
+            text, width, height, color, fonts: see draw().
+            encoding: a name in ENCODINGS, DEFAULT_ENCODING when None.
+        Returns:
+            A tuple, (text, bytes).
+            For example:
+                ('JGW9', b'\xff\xd8\xff\xe0\x00\x10JFIF...')
+
+        """
+        text, image = self.draw(text, width, height, color, fonts)
+        return text, self.encode(image, encoding)
+
+    def generate_captcha(self, encoding=None):
+        return self.render(encoding=encoding)
+
+    def generate_batch(self, count, executor=None, encoding=None):
+        """Render count captchas, on all cores when executor is a process pool.
+
+        Args:
+            count: number of captchas.
+            executor: a concurrent.futures executor, None to render in this thread.
+            encoding: a name in ENCODINGS.
+        Returns:
+            A list of (text, bytes) tuples.
+        """
+        if executor is None:
+            return [self.render(encoding=encoding) for _ in range(count)]
+        return list(executor.map(_render, [encoding] * count, chunksize=max(1, count // 16)))
+
+
+def process_pool(processes=None):
+    """A process pool for generate_batch, processes defaults to the number of cores."""
+    return ProcessPoolExecutor(max_workers=processes)
+
+
+def _render(encoding):
+    # runs in a worker process, which loads its own fonts on first use
+    return captcha.render(encoding=encoding)
 
-    def generate_captcha(self):
-        self.initialize()
-        return self.captcha("")
 
 captcha = Captcha.instance()
 
@@ -13,9 +13,18 @@
 from hashlib import md5
 import base64
 import datetime
+import io
+import threading
 from urllib import request as urllib2
 import json
-from .xmltojson import xmltojson
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import xmltojson
+
+
+_session_lock = threading.Lock()
 
 
 class REST:
@@ -30,6 +39,9 @@ class REST:
     Iflog = False  # 是否打印日志
     Batch = ''  # 时间戳
     BodyType = 'xml'  # 包体格式，可填值：json 、xml
+    ConnectTimeout = 3  # 建立连接的超时时间，单位：秒
+    ReadTimeout = 10  # 等待响应的超时时间，单位：秒
+    PoolSize = 10  # 连接池中保持的长连接数，应不小于同时发送的请求数
 
     # 初始化
     # @param serverIP       必选参数    服务器地址
@@ -65,6 +77,33 @@ class REST:
     def setAppId(self, AppId):
         self.AppId = AppId
 
+    # 发送请求
+    # 所有请求共用一个 requests.Session, 连接池中的长连接会被复用, 不需要每次重新进行TCP和TLS握手
+    # 超时和非2xx的响应抛出异常, 和 urlopen 的行为一致
+    # @param req  urllib.request.Request 对象
+
+    def urlopen(self, req):
+        response = self.getSession().request(req.get_method(), req.full_url, data=req.data,
+                                             headers=dict(req.header_items()),
+                                             timeout=(self.ConnectTimeout, self.ReadTimeout))
+        response.raise_for_status()
+        return io.BytesIO(response.content)
+
+    # 获取共享的 requests.Session, 第一次使用时创建
+
+    def getSession(self):
+        session = getattr(self, '_session', None)
+        if session is None:
+            with _session_lock:
+                session = getattr(self, '_session', None)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.PoolSize)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return session
+
     def log(self, url, body, data):
         print('这是请求的URL：')
         print(url)
@@ -104,7 +143,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -113,8 +152,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -155,7 +193,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -164,8 +202,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -206,7 +243,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -215,8 +252,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -264,7 +300,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -273,8 +309,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -331,7 +366,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -340,8 +375,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -390,7 +424,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -399,8 +433,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -442,11 +475,10 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
-            xtj = xmltojson()
-            locations = xtj.main(data)
+            locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -486,7 +518,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
 
             res.close()
@@ -496,8 +528,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -527,7 +558,7 @@ class REST:
         req.add_header("Authorization", auth)
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -536,8 +567,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -577,7 +607,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -586,8 +616,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main2(data)
+                locations = xmltojson.main2(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -618,7 +647,7 @@ class REST:
         req.add_header("Authorization", auth)
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
             res.close()
 
@@ -627,8 +656,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -668,7 +696,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
 
             res.close()
@@ -678,8 +706,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -718,7 +745,7 @@ class REST:
         req.data = body.encode()
 
         try:
-            res = urllib2.urlopen(req)
+            res = self.urlopen(req)
             data = res.read()
 
             res.close()
@@ -728,8 +755,7 @@ class REST:
                 locations = json.loads(data)
             else:
                 # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                locations = xmltojson.main(data)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -4,6 +4,7 @@
 # ssl._create_default_https_context =ssl._create_stdlib_context # 解决Mac开发环境下，网络错误的问题
 
 from verifications.libs.yuntongxun.CCPRestSDK import REST
+from utils import constants
 
 # 说明：主账号，登陆云通讯网站后，可在"控制台-应用"中看到开发者主账号ACCOUNT SID
 _accountSid = '8aaf07086010a0eb01602ec373bb0c35'
@@ -48,6 +49,8 @@ class CCP(object):
             cls._instants.rest = REST(_serverIP, _serverPort, _softVersion)
             cls._instants.rest.setAccount(_accountSid, _accountToken)
             cls._instants.rest.setAppId(_appId)
+            # 连接池的大小和 send_sms 同时发送的短信数一致
+            cls._instants.rest.PoolSize = constants.SMS_SEND_CONCURRENCY
 
         return cls._instants
 
@@ -0,0 +1,78 @@
+import time
+from collections import Counter
+from contextlib import ExitStack
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from verifications.libs.captcha.captcha import captcha, process_pool
+
+
+class Command(BaseCommand):
+    """
+    统计单核每秒能生成的图片验证码数
+    before: 每次生成都重新从磁盘加载字体(修改前的做法)
+    after: 字体在进程中只加载一次
+    --processes 大于0时, 再统计用进程池批量生成时所有核每秒生成的验证码数
+    --stages 统计每个绘制步骤的耗时, text 不包括其中每个字符的 warp/rotate/offset
+    用法: python manage.py bench_captcha --count 200 --processes 4 --stages
+    """
+    help = "图片验证码生成的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200, help="生成验证码的个数")
+        parser.add_argument("--processes", type=int, default=0, help="进程池的进程数")
+        parser.add_argument("--stages", action="store_true", help="统计每个步骤的耗时")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        self.stdout.write("%-8s %12s %14s" % ("case", "ms/captcha", "captchas/s/core"))
+        for case in ("before", "after"):
+            captcha.warm_up()
+            start = time.perf_counter()
+            for _ in range(count):
+                if case == "before":
+                    captcha._truetype_fonts.clear()
+                captcha.generate_captcha()
+            ms = (time.perf_counter() - start) * 1000 / count
+            self.stdout.write("%-8s %12.2f %14.1f" % (case, ms, 1000 / ms))
+
+        if options["processes"]:
+            with process_pool(options["processes"]) as executor:
+                # 预热, 启动进程并加载字体
+                captcha.generate_batch(options["processes"], executor)
+                start = time.perf_counter()
+                captcha.generate_batch(count, executor)
+                seconds = time.perf_counter() - start
+            self.stdout.write("进程池(%d个进程): %.1f captchas/s" % (options["processes"], count / seconds))
+
+        if options["stages"]:
+            self.stages(count)
+
+    def stages(self, count):
+        """每个验证码在各个步骤的平均耗时"""
+        seconds = Counter()
+
+        def timing(name, func):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    seconds[name] += time.perf_counter() - start
+            return wrapper
+
+        names = ("background", "text", "warp", "rotate", "offset", "curve", "noise", "smooth", "encode")
+        with ExitStack() as stack:
+            for name in names:
+                stack.enter_context(mock.patch.object(captcha, name, timing(name, getattr(captcha, name))))
+            start = time.perf_counter()
+            for _ in range(count):
+                captcha.generate_captcha()
+            total = time.perf_counter() - start
+
+        seconds["text"] -= seconds["warp"] + seconds["rotate"] + seconds["offset"]
+        seconds["other"] = total - sum(seconds.values())
+        self.stdout.write("%-12s %12s %8s" % ("stage", "ms/captcha", "share"))
+        for name in names + ("other",):
+            self.stdout.write("%-12s %12.3f %7.1f%%" % (name, seconds[name] * 1000 / count, seconds[name] * 100 / total))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from verifications.libs.captcha.captcha import ENCODINGS, available_encodings, captcha
+
+
+class Command(BaseCommand):
+    """
+    对比图片验证码各种编码的耗时和大小, 用同一批图片测试每种编码
+    每天的CPU时间和流量按 --daily 个验证码估算
+    用法: python manage.py bench_captcha_encoding --count 200 --daily 3000000
+    """
+    help = "图片验证码编码的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200, help="测试的图片数")
+        parser.add_argument("--daily", type=int, default=1000000, help="每天生成的验证码数")
+
+    def handle(self, *args, **options):
+        count, daily = options["count"], options["daily"]
+        captcha.warm_up()
+        images = [captcha.draw()[1] for _ in range(count)]
+
+        available = available_encodings()
+        self.stdout.write("%-10s %10s %10s %14s %12s" % ("encoding", "ms/encode", "bytes", "cpu s/day", "MB/day"))
+        for encoding in ENCODINGS:
+            if encoding not in available:
+                self.stdout.write("%-10s 当前的Pillow不支持" % encoding)
+                continue
+            start = time.perf_counter()
+            size = sum(len(captcha.encode(image, encoding)) for image in images)
+            ms = (time.perf_counter() - start) * 1000 / count
+            size /= count
+            self.stdout.write("%-10s %10.3f %10d %14.1f %12.1f" % (
+                encoding, ms, size, ms * daily / 1000, size * daily / 1024 / 1024))
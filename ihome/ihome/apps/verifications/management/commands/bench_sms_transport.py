@@ -0,0 +1,115 @@
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+from urllib import request as urllib2
+
+from django.core.management.base import BaseCommand
+
+from verifications.libs.yuntongxun.CCPRestSDK import REST
+
+RESPONSE_BODY = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                 b'<TemplateSMS><dateCreated>20190101000000</dateCreated><smsMessageSid>bench</smsMessageSid>'
+                 b'</TemplateSMS></Response>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟短信平台, 支持长连接"""
+    protocol_version = "HTTP/1.1"
+    # 响应头和包体分两次写入, 长连接上不关闭 Nagle 算法会和客户端的延迟确认叠加出约40ms的等待
+    disable_nagle_algorithm = True
+    latency = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    """
+    用本地的HTTPS模拟短信平台, 对比两种发送方式每秒能发送的短信数
+    before: 每条短信用 urlopen 新建连接(修改前的做法)
+    after: 共享连接池中的长连接
+    需要 openssl 命令生成临时的自签名证书
+    用法: python manage.py bench_sms_transport --messages 500 --concurrency 1 10
+    """
+    help = "短信平台HTTP连接的基准测试"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500, help="发送的短信数")
+        parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10], help="同时发送的短信数")
+        parser.add_argument("--latency", type=float, default=0, help="模拟平台处理每个请求的秒数")
+
+    def handle(self, *args, **options):
+        cert_dir = tempfile.mkdtemp()
+        try:
+            cert_file = os.path.join(cert_dir, "cert.pem")
+            key_file = os.path.join(cert_dir, "key.pem")
+            subprocess.check_call(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                                   "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                                   "-keyout", key_file, "-out", cert_file],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            StubHandler.latency = options["latency"]
+            server = StubServer(("127.0.0.1", 0), StubHandler)
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(cert_file, key_file)
+            server.socket = server_context.wrap_socket(server.socket, server_side=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+            client_context = ssl.create_default_context(cafile=cert_file)
+
+            def legacy_urlopen(rest, req):
+                return urllib2.urlopen(req, context=client_context)
+
+            self.stdout.write("%-8s %12s %12s %10s" % ("case", "concurrency", "messages/s", "ok"))
+            for concurrency in options["concurrency"]:
+                for case in ("before", "after"):
+                    rest = REST("127.0.0.1", str(server.server_address[1]), "2013-12-26")
+                    rest.setAccount("bench", "bench")
+                    rest.setAppId("bench")
+                    rest.PoolSize = concurrency
+                    session = rest.getSession()
+                    # 不使用环境变量中的 REQUESTS_CA_BUNDLE, 否则会覆盖 verify
+                    session.trust_env = False
+                    session.verify = cert_file
+                    with ExitStack() as stack:
+                        if case == "before":
+                            stack.enter_context(mock.patch.object(REST, "urlopen", legacy_urlopen))
+                        rate, ok = self.measure(rest, options["messages"], concurrency)
+                    session.close()
+                    self.stdout.write("%-8s %12d %12.1f %10d" % (case, concurrency, rate, ok))
+            server.shutdown()
+        finally:
+            shutil.rmtree(cert_dir)
+
+    @staticmethod
+    def measure(rest, messages, concurrency):
+        def send(_):
+            return rest.sendTemplateSMS("13800000000", ["123456", 5], 1).get("statusCode") == "000000"
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, range(messages)))
+        return messages / (time.perf_counter() - start), results.count(True)
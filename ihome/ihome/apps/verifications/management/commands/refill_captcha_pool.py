@@ -0,0 +1,54 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils import constants
+from verifications import captcha_pool
+from verifications.libs.captcha.captcha import process_pool
+
+logger = logging.getLogger("django")
+
+
+class Command(BaseCommand):
+    """
+    在后台持续补充图片验证码池, 每次最多生成 --batch-size 个, 之后暂停 --interval 秒
+    用法: python manage.py refill_captcha_pool --size 2000 --processes 4
+          python manage.py refill_captcha_pool --once
+    """
+    help = "补充图片验证码池"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=constants.IMAGE_CODE_POOL_SIZE, help="池子中保持的验证码数")
+        parser.add_argument("--batch-size", type=int, default=constants.IMAGE_CODE_POOL_REFILL_BATCH_SIZE,
+                            help="每次最多生成的验证码数")
+        parser.add_argument("--interval", type=float, default=constants.IMAGE_CODE_POOL_REFILL_INTERVAL,
+                            help="每次补充之间暂停的秒数")
+        parser.add_argument("--once", action="store_true", help="只补充一次, 把池子补满后退出")
+        parser.add_argument("--processes", type=int, default=1, help="生成验证码的进程数, 0表示CPU核数")
+
+    def handle(self, *args, **options):
+        executor = None if options["processes"] == 1 else process_pool(options["processes"] or None)
+        try:
+            self.refill(executor, options)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def refill(self, executor, options):
+        if options["once"]:
+            total = 0
+            while True:
+                count = captcha_pool.refill(options["size"], options["batch_size"], executor)
+                if not count:
+                    break
+                total += count
+            self.stdout.write("加入验证码 %d 个" % total)
+            return
+
+        while True:
+            try:
+                captcha_pool.refill(options["size"], options["batch_size"], executor)
+            except Exception as e:
+                logger.error(e)
+            time.sleep(options["interval"])
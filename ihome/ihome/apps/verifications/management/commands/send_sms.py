@@ -0,0 +1,55 @@
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from utils import constants
+from verifications import sms_queue
+
+logger = logging.getLogger("django")
+
+
+class Command(BaseCommand):
+    """
+    从短信队列中取出短信并发送, 可以同时运行多个进程, 每个进程用 --worker 指定不同的名字
+    进程启动时把同名进程上次没有发送完的短信放回队列
+    用法: python manage.py send_sms --worker sms1 --concurrency 10 --batch-size 50
+    """
+    help = "发送短信队列中的短信"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker", default=socket.gethostname(),
+                            help="发送进程的名字, 同一台机器上运行多个进程时必须不同")
+        parser.add_argument("--concurrency", type=int, default=constants.SMS_SEND_CONCURRENCY,
+                            help="同时发送的短信数")
+        parser.add_argument("--batch-size", type=int, default=constants.SMS_SEND_BATCH_SIZE,
+                            help="每次从队列中取出的短信数")
+        parser.add_argument("--max-attempts", type=int, default=constants.SMS_SEND_MAX_ATTEMPTS,
+                            help="每条短信最多发送的次数")
+        parser.add_argument("--timeout", type=int, default=1, help="队列为空时等待的秒数")
+        parser.add_argument("--once", action="store_true", help="队列为空时退出")
+
+    def handle(self, *args, **options):
+        worker = options["worker"]
+        recovered = sms_queue.recover(worker)
+        if recovered:
+            logger.info("放回上次没有发送完的短信 %d 条" % recovered)
+
+        sent = failed = 0
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while True:
+                try:
+                    messages = sms_queue.dequeue(worker, options["batch_size"], options["timeout"])
+                except Exception as e:
+                    logger.error(e)
+                    messages = []
+                if not messages:
+                    if options["once"]:
+                        break
+                    continue
+                results = list(executor.map(lambda item: sms_queue.send(item, options["max_attempts"], worker),
+                                            messages))
+                sent += results.count(True)
+                failed += results.count(False)
+        self.stdout.write("发送成功 %d 条, 失败 %d 条" % (sent, failed))
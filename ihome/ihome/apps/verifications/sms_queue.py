@@ -0,0 +1,163 @@
+"""
+短信发送队列
+
+视图只用 ENQUEUE_LUA 把短信放入 verify_code redis 中的列表就返回, 由 send_sms 命令在后台发送:
+    1. 每次从队列中取出一批短信, 移到发送进程自己的 sms_processing_<名字> 列表中, 在固定大小的线程池中并发发送
+    2. 发送结束后从 sms_processing 中删除, 发送失败的短信放入按时间排序的重试集合, 重试间隔每次翻倍, 超过最大次数后放弃
+    3. 每条短信的状态保存在 sms_status_<id> 中: queued / sending / retrying / sent / failed
+多个 send_sms 进程可以同时运行, 每条短信只会被一个进程取出
+发送进程异常退出时, 没有发送完的短信留在 sms_processing 中, 同名的进程启动时放回队列, 短信不会丢失
+"""
+import json
+import logging
+import time
+import uuid
+
+from django_redis import get_redis_connection
+
+from utils import constants
+from verifications.libs.yuntongxun.ccp_sms import CCP
+
+logger = logging.getLogger("django")
+
+# 从队列头部取出最多 ARGV[1] 条短信, 移到发送进程的 processing 列表中
+# KEYS: 发送队列, processing 列表
+DEQUEUE_SCRIPT = """
+local items = {}
+for i = 1, tonumber(ARGV[1]) do
+    local item = redis.call("LPOP", KEYS[1])
+    if not item then
+        break
+    end
+    redis.call("RPUSH", KEYS[2], item)
+    items[i] = item
+end
+return items
+"""
+
+# 把已经到重试时间的短信(最多 ARGV[2] 条)放回队列
+# KEYS: 重试集合, 发送队列, ARGV[1]: 当前时间戳
+MOVE_DUE_RETRIES_SCRIPT = """
+local items = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+for _, item in ipairs(items) do
+    redis.call("ZREM", KEYS[1], item)
+    redis.call("RPUSH", KEYS[2], item)
+end
+return #items
+"""
+
+# 把短信放入发送队列, 记录 queued 状态, 供需要和其他操作原子执行的脚本拼接使用, 参数由 enqueue_args 生成
+ENQUEUE_LUA = """
+local function enqueue(status_key, queue_key, message, status_expires, ...)
+    redis.call("HMSET", status_key, ...)
+    redis.call("EXPIRE", status_key, status_expires)
+    redis.call("RPUSH", queue_key, message)
+end
+"""
+_dequeue_script = None
+_move_due_retries_script = None
+
+
+def processing_key(worker):
+    """发送进程正在发送的短信列表的key"""
+    return constants.SMS_PROCESSING_REDIS_KEY % worker
+
+
+def new_message(mobile, datas, temp_id):
+    """生成一条待发送的短信"""
+    return {"id": uuid.uuid4().hex, "mobile": mobile, "datas": datas, "temp_id": temp_id, "attempts": 0}
+
+
+def enqueue_args(message):
+    """
+    ENQUEUE_LUA 中 enqueue 函数需要的key和参数
+    :return: ([短信状态, 发送队列], [短信json, 短信状态有效期, 短信状态的字段和值...])
+    """
+    fields = [item for field in status_fields(message, "queued").items() for item in field]
+    keys = [constants.SMS_STATUS_REDIS_KEY % message["id"], constants.SMS_QUEUE_REDIS_KEY]
+    return keys, [json.dumps(message), constants.SMS_STATUS_REDIS_EXPIRES] + fields
+
+
+def status_fields(message, status, error=""):
+    """短信状态hash中的字段"""
+    return {"status": status, "attempts": message["attempts"], "error": error, "update_time": int(time.time())}
+
+
+def set_status(conn, message, status, error=""):
+    key = constants.SMS_STATUS_REDIS_KEY % message["id"]
+    conn.hmset(key, status_fields(message, status, error))
+    conn.expire(key, constants.SMS_STATUS_REDIS_EXPIRES)
+
+
+def recover(worker):
+    """
+    发送进程启动时, 把上次没有发送完的短信放回队列头部
+    :return: 放回的短信数
+    """
+    redis_conn = get_redis_connection("verify_code")
+    count = 0
+    # 每次从 processing 尾部移到队列头部, 放回后保持原来的顺序
+    while redis_conn.rpoplpush(processing_key(worker), constants.SMS_QUEUE_REDIS_KEY):
+        count += 1
+    return count
+
+
+def dequeue(worker, batch_size, timeout):
+    """
+    从队列中取出最多 batch_size 条短信并移到发送进程的 processing 列表, 队列为空时最多等待 timeout 秒
+    :return: 短信json组成的列表, 发送时原样传给 send
+    """
+    global _dequeue_script
+    redis_conn = get_redis_connection("verify_code")
+    move_due_retries(redis_conn, batch_size)
+
+    if _dequeue_script is None:
+        _dequeue_script = redis_conn.register_script(DEQUEUE_SCRIPT)
+    items = _dequeue_script(keys=[constants.SMS_QUEUE_REDIS_KEY, processing_key(worker)], args=[batch_size],
+                            client=redis_conn)
+    if not items:
+        item = redis_conn.brpoplpush(constants.SMS_QUEUE_REDIS_KEY, processing_key(worker), timeout)
+        items = [item] if item else []
+    return items
+
+
+def move_due_retries(redis_conn, count):
+    """把已经到重试时间的短信放回队列, 查询和移动在一个脚本中原子执行"""
+    global _move_due_retries_script
+    if _move_due_retries_script is None:
+        _move_due_retries_script = redis_conn.register_script(MOVE_DUE_RETRIES_SCRIPT)
+    return _move_due_retries_script(keys=[constants.SMS_RETRY_REDIS_KEY, constants.SMS_QUEUE_REDIS_KEY],
+                                    args=[time.time(), count], client=redis_conn)
+
+
+def send(item, max_attempts, worker):
+    """
+    发送 dequeue 取出的一条短信并记录状态, 失败时安排重试
+    结果和从 processing 列表中删除在一个事务中执行, 进程中途退出时短信还在 processing 中
+    :return: 是否发送成功
+    """
+    redis_conn = get_redis_connection("verify_code")
+    message = json.loads(item.decode())
+    message["attempts"] += 1
+    set_status(redis_conn, message, "sending")
+    try:
+        result = CCP().send_sms_code(message["mobile"], message["datas"], message["temp_id"])
+        error = "" if result == 0 else "短信平台返回错误"
+    except Exception as e:
+        logger.error(e)
+        error = str(e)
+
+    pl = redis_conn.pipeline()
+    if not error:
+        set_status(pl, message, "sent")
+    elif message["attempts"] < max_attempts:
+        # 重试间隔每次翻倍
+        delay = constants.SMS_SEND_RETRY_DELAY * 2 ** (message["attempts"] - 1)
+        pl.zadd(constants.SMS_RETRY_REDIS_KEY, {json.dumps(message): time.time() + delay})
+        set_status(pl, message, "retrying", error)
+    else:
+        logger.error("短信发送失败 %s: %s" % (message["mobile"], error))
+        set_status(pl, message, "failed", error)
+    pl.lrem(processing_key(worker), 1, item)
+    pl.execute()
+    return not error
@@ -1,3 +1,77 @@
-from django.test import TestCase
+import gc
+import tracemalloc
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from verifications.libs.yuntongxun import xmltojson
+
+SEND_SMS_RESPONSE = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                     b'<TemplateSMS><dateCreated>20190101000000</dateCreated><smsMessageSid>0000abcd</smsMessageSid>'
+                     b'</TemplateSMS></Response>')
+ERROR_RESPONSE = (b'<?xml version="1.0" encoding="UTF-8"?><Response><statusCode>160040</statusCode>'
+                  b'<statusMsg>error</statusMsg></Response>')
+SUB_ACCOUNTS_RESPONSE = (b'<Response><statusCode>000000</statusCode><totalCount>2</totalCount>'
+                         b'<SubAccount><subAccountSid>a1</subAccountSid></SubAccount>'
+                         b'<SubAccount><subAccountSid>a2</subAccountSid></SubAccount></Response>')
+TEMPLATES_RESPONSE = (b'<Response><statusCode>000000</statusCode><totalCount>1</totalCount>'
+                      b'<TemplateSMS><id>1</id><status>1</status></TemplateSMS></Response>')
+
+
+class ResponseParseTest(SimpleTestCase):
+    """
+    云通讯响应的解析结果, 以及多次解析后内存不增长
+    """
+    PARSES = 100000
+    # 允许的内存增长，单位：字节
+    MAX_GROWTH = 64 * 1024
+
+    def test_send_sms_response(self):
+        self.assertEqual(xmltojson.main(SEND_SMS_RESPONSE), {
+            "statusCode": "000000",
+            "templateSMS": {"dateCreated": "20190101000000", "smsMessageSid": "0000abcd"},
+        })
+
+    def test_error_response(self):
+        self.assertEqual(xmltojson.main(ERROR_RESPONSE), {"statusCode": "160040", "statusMsg": "error"})
+
+    def test_sub_account_list(self):
+        self.assertEqual(xmltojson.main(SUB_ACCOUNTS_RESPONSE), {
+            "statusCode": "000000",
+            "totalCount": "2",
+            "SubAccount": [{"subAccountSid": "a1"}, {"subAccountSid": "a2"}],
+        })
+
+    def test_template_list(self):
+        self.assertEqual(xmltojson.main2(TEMPLATES_RESPONSE), {
+            "statusCode": "000000",
+            "totalCount": "1",
+            "TemplateSMS": [{"id": "1", "status": "1"}],
+        })
+
+    def test_results_not_shared(self):
+        first = xmltojson.main(SEND_SMS_RESPONSE)
+        second = xmltojson.main(ERROR_RESPONSE)
+        self.assertIsNot(first, second)
+        self.assertNotIn("templateSMS", second)
+        self.assertEqual(len(xmltojson.main(SUB_ACCOUNTS_RESPONSE)["SubAccount"]), 2)
+        self.assertEqual(len(xmltojson.main(SUB_ACCOUNTS_RESPONSE)["SubAccount"]), 2)
+
+    def test_memory_does_not_grow(self):
+        responses = [(xmltojson.main, SEND_SMS_RESPONSE), (xmltojson.main, ERROR_RESPONSE),
+                     (xmltojson.main, SUB_ACCOUNTS_RESPONSE), (xmltojson.main2, TEMPLATES_RESPONSE)]
+        # 先预热一轮, 排除第一次解析时加载模块和缓存的内存
+        for parse, xml in responses:
+            parse(xml)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for i in range(self.PARSES):
+                parse, xml = responses[i % len(responses)]
+                parse(xml)
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        self.assertLess(growth, self.MAX_GROWTH)
@@ -1,3 +1,4 @@
+from django.utils.decorators import method_decorator
 from django.views import View
 from django import http
 from django_redis import get_redis_connection
@@ -8,13 +9,37 @@ import json
 import random
 
 from utils import constants
+from utils.decorators import rate_limit
 from utils.response_code import RET
-from verifications.libs.captcha.captcha import captcha
-from verifications.libs.yuntongxun.ccp_sms import CCP
+from verifications import captcha_pool, sms_queue
+from verifications.libs.captcha.captcha import content_type
 
 
 logger = logging.getLogger("django")
 
+# 发送短信验证码, 检查发送标记、校验并删除图片验证码、保存短信验证码和标记、放入短信发送队列在一个脚本中原子执行
+# KEYS: 发送标记, 图片验证码, 短信验证码, 之后为 sms_queue.enqueue_args 的key
+# ARGV: 用户输入的图片验证码(大写), 短信验证码, 短信验证码有效期, 发送间隔, 之后为 sms_queue.enqueue_args 的参数
+# 返回0表示成功, 1: 发送频繁, 2: 图片验证码过期, 3: 图片验证码错误
+SEND_SMS_CODE_SCRIPT = sms_queue.ENQUEUE_LUA + """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return 1
+end
+local real_image_code = redis.call("GET", KEYS[2])
+if not real_image_code then
+    return 2
+end
+redis.call("DEL", KEYS[2])
+if string.upper(real_image_code) ~= ARGV[1] then
+    return 3
+end
+redis.call("SETEX", KEYS[3], ARGV[3], ARGV[2])
+redis.call("SETEX", KEYS[1], ARGV[4], 1)
+enqueue(KEYS[4], KEYS[5], unpack(ARGV, 5))
+return 0
+"""
+_send_sms_code_script = None
+
 
 class ImageCodeView(View):
     """
@@ -38,8 +63,8 @@ class ImageCodeView(View):
         if pre_uuid and not re.match(r"\w{8}(-\w{4}){3}-\w{12}", pre_uuid):
             return http.HttpResponseForbidden("参数格式不正确")
 
-        # 3、生成验证码
-        text, image = captcha.generate_captcha()
+        # 3、从验证码池中取出一个验证码, 池子为空时直接生成
+        text, image = captcha_pool.pop_captcha()
         logger.info("图片验证码是：%s" % text)
 
         # 4、将验证码保存到reids数据库
@@ -53,7 +78,7 @@ class ImageCodeView(View):
             logger.error(e)
             return http.HttpResponseServerError("生成图片验证码失败")
         else:
-            return http.HttpResponse(image, content_type='image/jpg')
+            return http.HttpResponse(image, content_type=content_type(constants.IMAGE_CODE_ENCODING))
 
 
 class SMSCodeView(View):
@@ -61,6 +86,7 @@ class SMSCodeView(View):
       需求：获取短信验证码
     """
 
+    @method_decorator(rate_limit("sms", "mobile"))
     def post(self, request):
 
         # 1、接收参数
@@ -69,13 +95,6 @@ class SMSCodeView(View):
         image_code_id = dict_data.get("id")
         image_code = dict_data.get("text")
 
-        # 2、创建实例redis实例对象
-        redis_conn = get_redis_connection('verify_code')
-
-        # 判断该手机号的标记是否存在，如果存在说明发送短信频繁
-        sms_code_flag = redis_conn.get("sms_code_flag_%s" % mobile)
-        if sms_code_flag:
-            return http.JsonResponse({'error': RET.REQERR, 'errmsg': '请求过于频繁'})
         # 2、校验参数
         if not all([mobile, image_code_id, image_code]):
             return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
@@ -83,40 +102,39 @@ class SMSCodeView(View):
         if not re.match(r"1[35678]\d{9}", mobile):
             return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
 
+        # 3、生成手机验证码
+        sms_code = "%06d" % random.randint(0, 999999)
+
+        # 4、在一个脚本中校验图片验证码, 将短信验证码保存到redis, 并放入短信发送队列, 由 send_sms 命令在后台发送
+        message = sms_queue.new_message(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES // 60],
+                                        constants.SMS_CODE_TEMPLATE_ID)
+        queue_keys, queue_args = sms_queue.enqueue_args(message)
         try:
-            real_image_code = redis_conn.get('ImageCode_' + image_code_id)
-            if not real_image_code:
-                return http.JsonResponse({"errno": RET.NODATA, "errmsg": "验证码已经过期"})
-            redis_conn.delete('ImageCode_' + image_code_id)
+            result = send_sms_code_script(
+                keys=["sms_code_flag_%s" % mobile, 'ImageCode_' + image_code_id, 'sms_%s' % mobile] + queue_keys,
+                args=[image_code.upper(), sms_code, constants.SMS_CODE_REDIS_EXPIRES,
+                      constants.SEND_SMS_CODE_INTERVAL] + queue_args)
         except Exception as e:
             logger.error(e)
             return http.JsonResponse({"errno": RET.DBERR, "errmsg": "数据库查询错误"})
 
-        # 因为redis数据库读出的数据是bytes类型，需要decode
-        if image_code.upper() != real_image_code.decode().upper():
+        # 判断该手机号的标记是否存在，如果存在说明发送短信频繁
+        if result == 1:
+            return http.JsonResponse({'errno': RET.REQERR, 'errmsg': '请求过于频繁'})
+        if result == 2:
+            return http.JsonResponse({"errno": RET.NODATA, "errmsg": "验证码已经过期"})
+        if result == 3:
             return http.JsonResponse({"errno": RET.DATAERR, "errmsg": "验证码输入错误"})
-
-        # 3、生成手机验证码
-        sms_code = "%06d" % random.randint(0, 999999)
         logger.info("短信验证码是:%s" % sms_code)
 
-        # 4、将短信验证码保存到redis
-        pl = redis_conn.pipeline()
-        pl.setex('sms_%s' % mobile, constants.SMS_CODE_REDIS_EXPIRES, sms_code)
-        pl.setex("sms_code_flag_%s" % mobile, constants.SEND_SMS_CODE_INTERVAL, 1)
-        pl.execute()
-
-        # 5、发送短信
-        # try:
-        #     result = CCP().send_sms_code(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES // 60], 1)
-        #     if result != 0:
-        #         return http.JsonResponse({"errno": RET.THIRDERR, "errmsg": "第三方系统出错"})
-        # except Exception as e:
-        #     logger.error(e)
-        #     return http.JsonResponse({"errno": RET.UNKOWNERR, "errmsg": "未知错误"})
-        # TODO：在考虑选用哪种异步任务实现短信发送
-
-        # 6、返回响应
+        # 5、返回响应
         return http.JsonResponse({'errno': RET.OK, 'errmsg': '发送短信成功'})
 
 
+def send_sms_code_script(keys, args):
+    """执行发送短信验证码的脚本"""
+    global _send_sms_code_script
+    redis_conn = get_redis_connection("verify_code")
+    if _send_sms_code_script is None:
+        _send_sms_code_script = redis_conn.register_script(SEND_SMS_CODE_SCRIPT)
+    return int(_send_sms_code_script(keys=keys, args=args, client=redis_conn))
@@ -56,6 +56,7 @@ CORS_ALLOW_HEADERS = (
     'x-csrftoken',
     'x-requested-with',
     'Pragma',
+    'idempotency-key',
 )
 
 # Application definition
@@ -80,7 +81,8 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.sessions.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -154,7 +156,9 @@ CACHES = {
 }
 
 # 配置session的保存路径
-SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+# SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+# 带本地缓存和用户快照的cache session
+SESSION_ENGINE = "utils.sessions"
 SESSION_CACHE_ALIAS = "session"
 
 
@@ -250,3 +254,21 @@ QINIU_URL= "http://q1q7ug61o.bkt.clouddn.com/"
 # 添加用户认证登录
 AUTHENTICATION_BACKENDS = ['utils.check_account.UsernameMobileAuthBackend']
 
+# 密码哈希算法, 第一个用于生成新密码, 其余的只用于校验旧密码, 用户登录成功时自动改用第一个
+PASSWORD_HASHERS = [
+    'utils.hashers.PBKDF2PasswordHasher',
+    'utils.hashers.BCryptSHA256PasswordHasher',
+    'utils.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# 密码哈希算法的计算成本, 修改后用户下次登录时密码自动按新的成本重新哈希
+PASSWORD_HASHER_COST = {
+    "pbkdf2_sha256": 36000,  # 迭代次数
+    "bcrypt_sha256": 12,  # log2(轮数)
+    "argon2": 2,  # time_cost
+}
+
+# 计算密码哈希的线程数, 0表示在处理请求的线程中直接计算
+PASSWORD_HASHER_THREADS = 0
+
@@ -21,4 +21,5 @@ urlpatterns = [
     url(r'^api/v1.0/', include("verifications.urls")),
     url(r'^api/v1.0/', include("users.urls")),
     url(r'^api/v1.0/', include("homes.urls")),
+    url(r'^api/v1.0/', include("order.urls")),
 ]
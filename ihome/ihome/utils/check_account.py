@@ -1,23 +1,50 @@
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
 
 from users.models import User
+from utils import constants, hashers
+
+
+def account_cache_key(account):
+    """账号对应用户id的缓存key"""
+    return "account_user_id_%s" % account
 
 
 def get_user_by_account(account):
     """
     根据account查询用户
+    用户名和手机号在一次查询中同时匹配, 用户名完全相同的优先
     :param account: 用户名或者手机号
     :return: user
     """
-    try:
-        user = User.objects.get(username=account)
-    except User.DoesNotExist:
-        try:
-            user = User.objects.get(mobile=account)
-        except User.DoesNotExist:
+    if constants.ACCOUNT_USER_ID_CACHE_EXPIRES:
+        # 短时间内重复登录失败的账号, 直接用缓存中的用户id查询, 不存在的账号不再查询数据库
+        user_id = cache.get(account_cache_key(account))
+        if user_id == -1:
             return None
+        if user_id is not None:
+            return User.objects.filter(pk=user_id).first()
+
+    users = list(User.objects.filter(Q(username=account) | Q(mobile=account))[0:2])
+    if not users:
+        return None
+
+    for user in users:
+        if user.username == account:
+            return user
+    return users[0]
+
+
+def cache_failed_account(account, user):
+    """登录失败时缓存账号对应的用户id, 用户不存在时缓存 -1"""
+    if constants.ACCOUNT_USER_ID_CACHE_EXPIRES:
+        cache.set(account_cache_key(account), user.id if user else -1, constants.ACCOUNT_USER_ID_CACHE_EXPIRES)
+
 
-    return user
+def clear_account_cache(*accounts):
+    """注册或修改用户名后删除账号的缓存"""
+    cache.delete_many([account_cache_key(account) for account in accounts if account])
 
 
 class UsernameMobileAuthBackend(ModelBackend):
@@ -26,5 +53,6 @@ class UsernameMobileAuthBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         user = get_user_by_account(username)
         # 校验user是否存在并校验密码是否正确
-        if user and user.check_password(password):
-            return user
\ No newline at end of file
+        if user and hashers.check_password(user, password):
+            return user
+        cache_failed_account(username, user)
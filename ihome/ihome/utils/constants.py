@@ -21,14 +21,126 @@ HOME_PAGE_MAX_HOUSES = 5
 # 首页房屋数据的Redis缓存时间，单位：秒
 HOME_PAGE_DATA_REDIS_EXPIRES = 7200
 
+# 首页房屋数据的Redis缓存key
+HOME_PAGE_DATA_REDIS_KEY = "home_page_data"
+
 # 房屋详情页展示的评论最大数
 HOUSE_DETAIL_COMMENT_DISPLAY_COUNTS = 30
 
 # 房屋详情页面数据Redis缓存时间，单位：秒
 HOUSE_DETAIL_REDIS_EXPIRE_SECOND = 7200
 
+# 房屋详情页面数据Redis缓存key，%s为房屋id
+HOUSE_DETAIL_REDIS_KEY = "house_info_%s"
+
 # 房屋列表页面每页显示条目数
 HOUSE_LIST_PAGE_CAPACITY = 2
 
 # 房屋列表页面Redis缓存时间，单位：秒
 HOUSE_LIST_REDIS_EXPIRES = 7200
+
+# 待接单订单的超时时间，超过后自动拒单，单位：秒
+ORDER_WAIT_ACCEPT_TIMEOUT = 24 * 3600
+
+# 超时订单每批处理的条数
+ORDER_EXPIRE_BATCH_SIZE = 500
+
+# 批量接单/拒单一次最多处理的订单数
+ORDER_BATCH_STATUS_MAX_COUNT = 100
+
+# 已结束的订单超过多少个月后归档，单位：月
+ORDER_ARCHIVE_MONTHS = 6
+
+# 归档订单时每批处理的条数
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+# 房东统计数据Redis缓存时间，单位：秒
+LANDLORD_STATS_REDIS_EXPIRES = 600
+
+# 房东统计数据Redis缓存key，参数为房东id和年份
+LANDLORD_STATS_REDIS_KEY = "landlord_stats_%s_%s"
+
+# 批量查询房屋是否可订及价格时一次最多的房屋数
+HOUSE_QUOTE_MAX_COUNT = 50
+
+# 房屋预订日历Redis缓存时间，单位：秒
+HOUSE_CALENDAR_REDIS_EXPIRES = 7200
+
+# 房屋预订日历Redis缓存key，参数为房屋id和月份
+HOUSE_CALENDAR_REDIS_KEY = "house_calendar_%s_%s"
+
+# 房屋预订日历一次最多查询的月份数
+HOUSE_CALENDAR_MAX_MONTHS = 12
+
+# 幂等请求的响应在Redis中的保存时间，单位：秒
+IDEMPOTENCY_KEY_REDIS_EXPIRES = 24 * 3600
+
+# 幂等请求处理中的标记时间，超过后认为第一次请求已经失败，单位：秒
+IDEMPOTENCY_LOCK_EXPIRES = 60
+
+# 重复请求等待第一次请求处理完成的最长时间，单位：秒
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# 登录失败的账号对应用户id的缓存时间，0表示不缓存，单位：秒
+ACCOUNT_USER_ID_CACHE_EXPIRES = 60
+
+# 接口限流，每个IP和每个账号在时间窗口内最多的请求次数，格式为 (次数, 窗口秒数)
+RATE_LIMITS = {
+    "login": {"ip": (30, 60), "account": (5, 60)},
+    "register": {"ip": (10, 3600), "account": (5, 3600)},
+    "sms": {"ip": (20, 3600), "account": (10, 3600)},
+}
+
+# 带用户快照的session在进程内的缓存时间，单位：秒
+SESSION_LOCAL_CACHE_EXPIRES = 5
+
+# 每个进程最多缓存的session数
+SESSION_LOCAL_CACHE_MAX_COUNT = 10000
+
+# 用户版本号的key，退出登录、修改密码等操作时更新，参数为用户id
+SESSION_USER_VERSION_KEY = "session_user_version_%s"
+
+# 预先生成的图片验证码池的Redis key，参数为图片编码
+IMAGE_CODE_POOL_REDIS_KEY = "image_code_pool_%s"
+
+# 图片验证码的编码，可选值见 verifications.libs.captcha.captcha.ENCODINGS
+IMAGE_CODE_ENCODING = "jpeg"
+
+# 图片验证码池中保持的验证码数
+IMAGE_CODE_POOL_SIZE = 2000
+
+# 补充验证码池时每次最多生成的验证码数
+IMAGE_CODE_POOL_REFILL_BATCH_SIZE = 100
+
+# 补充验证码池的间隔，单位：秒
+IMAGE_CODE_POOL_REFILL_INTERVAL = 1
+
+# 短信验证码的短信模板id
+SMS_CODE_TEMPLATE_ID = 1
+
+# 短信发送队列的Redis key
+SMS_QUEUE_REDIS_KEY = "sms_queue"
+
+# 等待重试的短信的Redis key
+SMS_RETRY_REDIS_KEY = "sms_retry"
+
+# 发送进程正在发送的短信的Redis key，参数为发送进程的名字
+SMS_PROCESSING_REDIS_KEY = "sms_processing_%s"
+
+# 短信发送状态的Redis key，参数为短信id
+SMS_STATUS_REDIS_KEY = "sms_status_%s"
+
+# 短信发送状态的保存时间，单位：秒
+SMS_STATUS_REDIS_EXPIRES = 24 * 3600
+
+# 每个发送进程同时发送的短信数
+SMS_SEND_CONCURRENCY = 10
+
+# 发送进程每次从队列中取出的短信数
+SMS_SEND_BATCH_SIZE = 50
+
+# 每条短信最多发送的次数
+SMS_SEND_MAX_ATTEMPTS = 3
+
+# 第一次重试的等待时间，之后每次翻倍，单位：秒
+SMS_SEND_RETRY_DELAY = 5
@@ -1,7 +1,39 @@
+import hashlib
+import json
+import logging
+import time
+import uuid
+
 from django import http
+from django_redis import get_redis_connection
 
+from utils import constants
 from utils.response_code import RET
 
+logger = logging.getLogger("django")
+
+# 滑动窗口限流, 检查和记录在一个脚本中原子执行, 任何一个key超限都不记录本次请求
+# KEYS: 限流的key, ARGV[1]: 当前毫秒时间戳, ARGV[2]: 本次请求的唯一标识, 之后每个key依次为 次数 和 窗口毫秒数
+# 返回0表示允许, 否则为还需要等待的毫秒数
+RATE_LIMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2 + 1])
+    local window = tonumber(ARGV[i * 2 + 2])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+    if redis.call("ZCARD", key) >= limit then
+        local oldest = redis.call("ZRANGE", key, 0, 0, "WITHSCORES")
+        return tonumber(oldest[2]) + window - now
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call("ZADD", key, now, ARGV[2])
+    redis.call("PEXPIRE", key, ARGV[i * 2 + 2])
+end
+return 0
+"""
+_rate_limit_script = None
+
 
 def login_required(view_func):
     """
@@ -14,4 +46,142 @@ def login_required(view_func):
             return view_func(request, *args, **kwargs)
         else:
             return http.JsonResponse({"errno":RET.SESSIONERR, "errmsg": "用户未登录"})
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def request_fingerprint(request):
+    """
+    请求方法和请求体的sha256, 用于判断重复请求的内容是否和第一次相同
+    上传文件的请求按表单字段和文件内容计算, 不把整个请求体读入内存
+    """
+    digest = hashlib.sha256(request.method.encode())
+    if request.content_type == "multipart/form-data":
+        for key, values in sorted(request.POST.lists()):
+            digest.update(json.dumps([key, values]).encode())
+        for key, files in sorted(request.FILES.lists()):
+            for file in files:
+                digest.update(json.dumps([key, file.name, file.size]).encode())
+                for chunk in file.chunks():
+                    digest.update(chunk)
+                # 视图还需要读取文件
+                file.seek(0)
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def idempotent(view_func):
+    """
+      定义幂等装饰器, 需要放在 login_required 之后
+      客户端在请求头 Idempotency-Key 中带上唯一的key, 同一个用户同一个接口的相同key只会处理一次:
+        1. 第一次请求正常处理, 成功的响应保存到redis
+        2. 之后的重复请求直接返回保存的响应
+        3. 第一次请求还没有处理完时, 重复请求等待它完成, 超时则返回请求过于频繁
+        4. 第一次请求失败时key被删除, 等待中的重复请求重新抢占key并执行视图
+        5. 同一个key的请求方法或者请求体和第一次不同时返回参数错误, 不会执行视图
+      :param view_func:
+      :return:
+    """
+    def wrapper(request, *args, **kwargs):
+        idempotency_key = request.META.get("HTTP_IDEMPOTENCY_KEY")
+        if not idempotency_key:
+            return view_func(request, *args, **kwargs)
+
+        if len(idempotency_key) > 64:
+            return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "参数错误"})
+
+        redis_conn = get_redis_connection("default")
+        redis_key = "idempotency_%s_%s_%s" % (request.user.id, request.path, idempotency_key)
+        fingerprint = request_fingerprint(request)
+        reservation = json.dumps({"fingerprint": fingerprint})
+
+        # 抢到处理权的请求执行视图, 其他请求等待结果
+        deadline = time.time() + constants.IDEMPOTENCY_WAIT_SECONDS
+        while not redis_conn.set(redis_key, reservation, ex=constants.IDEMPOTENCY_LOCK_EXPIRES, nx=True):
+            saved = redis_conn.get(redis_key)
+            if saved is None:
+                # 第一次请求失败已经删除了key, 重新抢占
+                continue
+            saved = json.loads(saved.decode())
+            if saved["fingerprint"] != fingerprint:
+                return http.JsonResponse({"errno": RET.PARAMERR, "errmsg": "Idempotency-Key 已用于其他请求"})
+            if "content" in saved:
+                response = http.HttpResponse(saved["content"], status=saved["status"],
+                                             content_type=saved["content_type"])
+                response["Idempotent-Replayed"] = "true"
+                return response
+            if time.time() > deadline:
+                return http.JsonResponse({"errno": RET.REQERR, "errmsg": "请求正在处理中"})
+            time.sleep(0.1)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            redis_conn.delete(redis_key)
+            raise
+
+        # 只保存处理成功的响应, 失败的请求可以用同一个key重试
+        try:
+            succeeded = json.loads(response.content.decode()).get("errno") == RET.OK
+        except Exception:
+            succeeded = False
+        if succeeded:
+            saved = {"fingerprint": fingerprint, "status": response.status_code,
+                     "content_type": response["Content-Type"], "content": response.content.decode()}
+            redis_conn.setex(redis_key, constants.IDEMPOTENCY_KEY_REDIS_EXPIRES, json.dumps(saved))
+        else:
+            redis_conn.delete(redis_key)
+        return response
+    return wrapper
+
+
+def rate_limit(scope, account_field=None):
+    """
+      定义限流装饰器, 按 constants.RATE_LIMITS[scope] 同时限制每个IP和每个账号的请求次数
+      超限的请求直接返回, 不会执行视图, 也就不会查询数据库和计算密码哈希
+      redis不可用时不限流
+      :param scope: 限流的接口名
+      :param account_field: 请求体json中账号的字段名, 为None时只按IP限流
+      :return:
+    """
+    limits = constants.RATE_LIMITS[scope]
+
+    def decorator(view_func):
+        def wrapper(request, *args, **kwargs):
+            identities = {"ip": request.META.get("REMOTE_ADDR")}
+            if account_field:
+                try:
+                    identities["account"] = json.loads(request.body.decode()).get(account_field)
+                except Exception:
+                    identities["account"] = None
+
+            keys, limit_args = [], []
+            for kind, (count, seconds) in limits.items():
+                if identities.get(kind):
+                    keys.append("rate_limit_%s_%s_%s" % (scope, kind, identities[kind]))
+                    limit_args.extend([count, seconds * 1000])
+
+            try:
+                wait = check_rate_limit(keys, limit_args)
+            except Exception as e:
+                logger.error(e)
+                wait = 0
+            if wait:
+                response = http.JsonResponse({"errno": RET.REQERR, "errmsg": "请求过于频繁"})
+                response["Retry-After"] = (wait + 999) // 1000
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def check_rate_limit(keys, limit_args):
+    """执行限流脚本, 返回还需要等待的毫秒数"""
+    global _rate_limit_script
+    if not keys:
+        return 0
+    redis_conn = get_redis_connection("default")
+    if _rate_limit_script is None:
+        _rate_limit_script = redis_conn.register_script(RATE_LIMIT_SCRIPT)
+    now = int(time.time() * 1000)
+    return int(_rate_limit_script(keys=keys, args=[now, uuid.uuid4().hex] + limit_args, client=redis_conn))
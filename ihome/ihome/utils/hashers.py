@@ -0,0 +1,80 @@
+"""
+密码哈希策略
+
+settings.PASSWORD_HASHERS 的第一个算法用于生成新密码, 各算法的计算成本由 settings.PASSWORD_HASHER_COST 配置
+修改算法或者成本后不需要迁移数据, 用户下次登录成功时密码会按新的策略重新哈希
+settings.PASSWORD_HASHER_THREADS 大于0时, 哈希在固定大小的线程池中计算, 不占用处理请求的线程
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hasher_cost(algorithm, default):
+    """settings 中配置的算法成本, 没有配置时使用 Django 的默认值"""
+    return getattr(settings, "PASSWORD_HASHER_COST", {}).get(algorithm, default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """成本为迭代次数"""
+
+    @property
+    def iterations(self):
+        return hasher_cost(self.algorithm, hashers.PBKDF2PasswordHasher.iterations)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """成本为 log2(轮数), 需要安装 bcrypt"""
+
+    @property
+    def rounds(self):
+        return hasher_cost(self.algorithm, hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """成本为 time_cost, 需要安装 argon2-cffi"""
+
+    @property
+    def time_cost(self):
+        return hasher_cost(self.algorithm, hashers.Argon2PasswordHasher.time_cost)
+
+
+def get_executor():
+    """计算哈希的线程池, 第一次使用时创建"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHER_THREADS)
+    return _executor
+
+
+def run_hasher(func, *args):
+    """在线程池中执行 func 并等待结果, 没有配置线程池时直接执行"""
+    if not getattr(settings, "PASSWORD_HASHER_THREADS", 0):
+        return func(*args)
+    return get_executor().submit(func, *args).result()
+
+
+def make_password(password):
+    """生成密码哈希"""
+    return run_hasher(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """
+    校验用户的密码, 密码正确并且哈希策略已经修改时重新哈希并保存
+    数据库操作都在当前线程中执行, 线程池中只计算哈希
+    :return: 密码是否正确
+    """
+    must_update = []
+    is_correct = run_hasher(hashers.check_password, password, user.password, must_update.append)
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
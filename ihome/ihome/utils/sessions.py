@@ -0,0 +1,173 @@
+"""
+带本地缓存的session和用户快照
+
+登录用户的session中保存一份用户快照(除密码外的字段)和快照时的版本号, 版本号保存在session的redis中:
+    1. SessionStore 在进程内缓存session几秒, 命中时只需要从redis读取一个很小的版本号
+    2. AuthenticationMiddleware 对 GET/HEAD 请求直接用快照生成 request.user, 不查询数据库
+用户退出登录、修改密码或者保存用户信息时更新版本号, 所有进程中的本地缓存和快照立即失效
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import middleware
+from django.contrib.sessions.backends import cache as cache_backend
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+from utils import constants
+
+USER_SNAPSHOT_SESSION_KEY = "_auth_user_snapshot"
+
+# 本地缓存: session_key -> (过期时间, session数据)
+_local_sessions = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def user_version_key(user_id):
+    """用户版本号的key"""
+    return constants.SESSION_USER_VERSION_KEY % user_id
+
+
+def get_user_version(user_id):
+    """用户当前的版本号, 没有时为None"""
+    return caches[settings.SESSION_CACHE_ALIAS].get(user_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """更新用户的版本号, 使用户所有session的本地缓存和快照失效"""
+    caches[settings.SESSION_CACHE_ALIAS].set(user_version_key(user_id), uuid.uuid4().hex, settings.SESSION_COOKIE_AGE)
+
+
+def make_snapshot(user, version):
+    """生成用户快照, 不包含密码"""
+    fields = [field for field in user._meta.concrete_fields if field.attname != "password"]
+    return {
+        "user_id": user.pk,
+        "version": version,
+        "fields": [field.attname for field in fields],
+        "values": [field.get_prep_value(field.value_from_object(user)) for field in fields],
+    }
+
+
+def snapshot_version(session_data):
+    """session数据中快照的版本号, 没有快照时返回 False"""
+    snapshot = session_data.get(USER_SNAPSHOT_SESSION_KEY)
+    if not snapshot or str(snapshot["user_id"]) != str(session_data.get(auth.SESSION_KEY)):
+        return False
+    return snapshot["version"]
+
+
+class SessionStore(cache_backend.SessionStore):
+    """
+    在进程内缓存带有用户快照的session, 最多 SESSION_LOCAL_CACHE_EXPIRES 秒
+    读取时用快照的版本号和redis中的用户版本号比较, 不一致时重新从redis读取
+    """
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        self._user_version = None
+        self._user_version_loaded = False
+
+    @property
+    def user_version(self):
+        """本次请求读取到的用户版本号, 中间件用它校验快照, 第一次访问时才从redis读取"""
+        if not self._user_version_loaded:
+            user_id = self._get_session().get(auth.SESSION_KEY)
+            self._user_version = None if user_id is None else get_user_version(user_id)
+            self._user_version_loaded = True
+        return self._user_version
+
+    @user_version.setter
+    def user_version(self, value):
+        self._user_version = value
+        self._user_version_loaded = True
+
+    def load(self):
+        session_key = self.session_key
+        now = time.monotonic()
+        if session_key:
+            with _local_lock:
+                entry = _local_sessions.get(session_key)
+            if entry and entry[0] > now:
+                data = entry[1]
+                self.user_version = get_user_version(data[auth.SESSION_KEY])
+                if snapshot_version(data) == self.user_version:
+                    return copy.deepcopy(data)
+            if entry:
+                self.forget(session_key)
+
+        data = super(SessionStore, self).load()
+        # 没有快照的session不缓存, 也不读取版本号
+        if not session_key or snapshot_version(data) is False:
+            return data
+
+        self.user_version = get_user_version(data[auth.SESSION_KEY])
+        if snapshot_version(data) == self.user_version:
+            with _local_lock:
+                _local_sessions[session_key] = (now + constants.SESSION_LOCAL_CACHE_EXPIRES, copy.deepcopy(data))
+                _local_sessions.move_to_end(session_key)
+                while len(_local_sessions) > constants.SESSION_LOCAL_CACHE_MAX_COUNT:
+                    _local_sessions.popitem(last=False)
+        return data
+
+    def save(self, must_create=False):
+        super(SessionStore, self).save(must_create)
+        self.forget(self.session_key)
+
+    def delete(self, session_key=None):
+        super(SessionStore, self).delete(session_key)
+        self.forget(session_key or self.session_key)
+
+    @staticmethod
+    def forget(session_key):
+        """删除本进程中的缓存"""
+        with _local_lock:
+            _local_sessions.pop(session_key, None)
+
+
+def session_user_id(request):
+    """只从session中读取登录用户的id, 不查询用户, 未登录时返回None"""
+    user_id = request.session.get(auth.SESSION_KEY)
+    if user_id is None:
+        return None
+    return auth.get_user_model()._meta.pk.to_python(user_id)
+
+
+def get_user(request):
+    """
+    GET/HEAD 请求优先使用session中的用户快照, 其他请求和快照失效时从数据库查询用户
+    快照生成的用户没有加载密码字段, 视图保存它时只会更新已加载的字段
+    """
+    if hasattr(request, "_cached_user"):
+        return request._cached_user
+
+    session = request.session
+    user = None
+    if request.method in ("GET", "HEAD") and isinstance(session, SessionStore):
+        # 访问session数据时才会执行load
+        session_data = session._get_session()
+        if snapshot_version(session_data) == session.user_version:
+            snapshot = session_data[USER_SNAPSHOT_SESSION_KEY]
+            user = auth.get_user_model().from_db(DEFAULT_DB_ALIAS, snapshot["fields"], snapshot["values"])
+        else:
+            user = auth.get_user(request)
+            if user.is_authenticated:
+                session[USER_SNAPSHOT_SESSION_KEY] = make_snapshot(user, session.user_version)
+
+    request._cached_user = user or auth.get_user(request)
+    return request._cached_user
+
+
+class AuthenticationMiddleware(middleware.AuthenticationMiddleware):
+    """用session中的用户快照生成 request.user 的认证中间件"""
+
+    def process_request(self, request):
+        super(AuthenticationMiddleware, self).process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+